@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+# Benchmark of MangaPdfConverter.convert on a synthetic corpus.
+# Each container is converted in each mode (default, --jpeg, --grayscale) in a fresh process,
+# and the throughput (pages/s, MB/s) and peak memory are reported and stored as JSON for comparison across versions.
+#
+#   $ python benchmarks/bench_convert.py [--pages 40] [--width 1200] [--height 1800] [--compare results/old.json]
+
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import argparse
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARK_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+from manga2pdf.manga2pdf import __version__
+from corpus import PAGE_KINDS, CONTAINERS, generate_corpus
+
+MODES = {'default': [], 'jpeg': ['--jpeg'], 'grayscale': ['--grayscale']}
+
+# Function to convert a book in a fresh process and return the metrics reported by --metrics json
+def run_conversion(input_path, output_path, mode, extra_args):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    command = [sys.executable, '-m', 'manga2pdf.manga2pdf', input_path, '-o', output_path, '--metrics', 'json'] + MODES[mode] + extra_args
+    result = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    lines = [line for line in result.stdout.decode('utf-8').splitlines() if line.startswith('{')]
+    return json.loads(lines[-1])
+
+# Function to get the size of an input file or directory in bytes
+def get_input_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+    return os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the conversion on a synthetic corpus')
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=1800)
+    parser.add_argument('--kinds', nargs='+', default=PAGE_KINDS, choices=PAGE_KINDS)
+    parser.add_argument('--containers', nargs='+', default=CONTAINERS, choices=CONTAINERS)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs of each conversion (the fastest is kept)')
+    parser.add_argument('--corpus-dir', type=str, default=None, help='directory of the corpus (default: a temporary directory)')
+    parser.add_argument('--results', type=str, default=os.path.join(BENCHMARK_DIR, 'results'),
+                        help='directory where the results are stored as JSON')
+    parser.add_argument('--compare', type=str, default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='extra options passed to manga2pdf after --')
+    args = parser.parse_args()
+    extra_args = [arg for arg in args.args if arg != '--']
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = {(result['container'], result['mode']): result for result in json.load(f)['results']}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir or os.path.join(tmp_dir, 'corpus')
+        books = generate_corpus(corpus_dir, args.pages, args.width, args.height, args.kinds, args.containers)
+        results = []
+        print(f'manga2pdf {__version__}: {args.pages} pages of {args.width}x{args.height}, best of {args.repeat}')
+        print(f'{"container":<10}{"mode":<10}{"time":>9}{"pages/s":>10}{"MB/s":>9}{"peak RSS":>11}{"output":>10}{"change":>9}')
+        for container, input_path in books.items():
+            input_size = get_input_size(input_path)
+            for mode in args.modes:
+                output_path = os.path.join(tmp_dir, f'{container}_{mode}.pdf')
+                best = None
+                for _ in range(args.repeat):
+                    metrics = run_conversion(input_path, output_path, mode, extra_args)
+                    if best is None or metrics['wall_time'] < best['wall_time']:
+                        best = metrics
+                result = {
+                    'container': container,
+                    'mode': mode,
+                    'pages': best['pages'],
+                    'input_bytes': input_size,
+                    'output_bytes': os.path.getsize(output_path),
+                    'wall_time': best['wall_time'],
+                    'pages_per_second': best['pages'] / best['wall_time'],
+                    'megabytes_per_second': input_size / 1024 / 1024 / best['wall_time'],
+                    'peak_rss': best['peak_rss'],
+                    'stages': best['stages'],
+                }
+                results.append(result)
+                change = ''
+                if (container, mode) in previous:
+                    change = f'{(result["wall_time"] / previous[(container, mode)]["wall_time"] - 1) * 100:+.0f}%'
+                peak_rss = f'{result["peak_rss"] / 1024 / 1024:.0f}MB' if result['peak_rss'] is not None else '-'
+                print(f'{container:<10}{mode:<10}{result["wall_time"]:>8.2f}s{result["pages_per_second"]:>10.1f}'
+                      f'{result["megabytes_per_second"]:>9.1f}{peak_rss:>11}{result["output_bytes"] / 1024 / 1024:>8.1f}MB{change:>9}')
+
+    os.makedirs(args.results, exist_ok=True)
+    results_path = os.path.join(args.results, f'{__version__}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': __version__,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {'pages': args.pages, 'width': args.width, 'height': args.height, 'kinds': args.kinds, 'extra_args': extra_args},
+            'results': results,
+        }, f, indent=1)
+    print(f'Results: {results_path}')
+
+if __name__ == '__main__':
+    main()
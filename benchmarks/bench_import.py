@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+# Startup check of the manga2pdf entry point.
+# Imports manga2pdf.manga2pdf in a fresh interpreter with -X importtime, reports the cumulative import time and
+# fails (exit status 1) if it exceeds the budget or if one of the heavy libraries is imported at startup.
+#
+#   $ python benchmarks/bench_import.py [--budget-ms 100] [--repeat 5]
+
+import os
+import sys
+import argparse
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Libraries that must only be imported by the code paths that use them
+HEAVY_MODULES = ['numpy', 'PIL', 'lxml', 'py7zr', 'rarfile', 'img2pdf', 'pikepdf']
+
+# Function to import the module in a fresh interpreter and return the cumulative import times in microseconds by module
+def measure_import(module):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    times = {}
+    for line in result.stderr.decode('utf-8').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup check of the manga2pdf entry point')
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='largest import time of manga2pdf.manga2pdf')
+    parser.add_argument('--repeat', type=int, default=5, help='number of imports (the fastest is kept)')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest modules to show')
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        times = measure_import('manga2pdf.manga2pdf')
+        if best is None or times['manga2pdf.manga2pdf'] < best['manga2pdf.manga2pdf']:
+            best = times
+    total_ms = best['manga2pdf.manga2pdf'] / 1000
+    print(f'import manga2pdf.manga2pdf: {total_ms:.1f}ms (budget {args.budget_ms:.0f}ms, best of {args.repeat})')
+    for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f'  {cumulative / 1000:>8.1f}ms  {name}')
+
+    failed = False
+    heavy = [module for module in HEAVY_MODULES if module in best]
+    if heavy:
+        print(f'FAILED: imported at startup: {", ".join(heavy)}')
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f'FAILED: the import time exceeds the budget of {args.budget_ms:.0f}ms')
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+# Benchmark of the color detection used by the --grayscale mode.
+# Compares MangaPdfConverter.is_color with the previous float64 implementation on synthetic scans.
+#
+#   $ python benchmarks/bench_is_color.py [--width 3000] [--height 4500] [--repeat 3]
+
+import io
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from manga2pdf.manga2pdf import MangaPdfConverter
+
+# The implementation of is_color before the single uint8 pass
+def legacy_is_color(img):
+    if img.mode == 'L':
+        return False
+    img = img.convert('RGB')
+    r_arr = np.array(img)[:, :, 0]/ 255
+    g_arr = np.array(img)[:, :, 1]/ 255
+    b_arr = np.array(img)[:, :, 2]/ 255
+    diff_rg = np.abs(r_arr - g_arr)
+    diff_gb = np.abs(g_arr - b_arr)
+    diff_rb = np.abs(r_arr - b_arr)
+    threshold = 0.5
+    not_gray_indices = np.argwhere(
+        (diff_rg > threshold) | (diff_gb > threshold) | (diff_rb > threshold)
+    )
+    return not_gray_indices.shape[0] != 0
+
+# Function to determine whether JPEG data is a color image, decoding it at reduced resolution when color_sample_size is set
+# The conversion decodes the pages at full resolution; this measures what the JPEG draft mode would save
+def is_color_data(converter, img_data):
+    with Image.open(io.BytesIO(img_data)) as img:
+        if converter.color_sample_size is not None and img.format == 'JPEG':
+            scale = max(img.size) / converter.color_sample_size
+            if scale > 1:
+                img.draft('RGB', (int(img.width / scale), int(img.height / scale)))
+        return converter.is_color(img)
+
+# Function to generate the synthetic pages: a gray page stored as RGB (the worst case, every pixel is checked),
+# a color page and a gray page with a small color mark near the bottom
+def make_pages(width, height):
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+    gray_rgb = np.repeat(gray[:, :, None], 3, axis=2)
+    color = gray_rgb.copy()
+    color[:, :, 0] = 255 - color[:, :, 2]
+    marked = gray_rgb.copy()
+    marked[height - 200:height - 100, 100:200] = (255, 0, 0)
+    return {
+        'gray': Image.fromarray(gray_rgb),
+        'color': Image.fromarray(color),
+        'color mark': Image.fromarray(marked),
+    }
+
+def measure(func, img, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(img)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the color detection')
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=4500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sample-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    converter = MangaPdfConverter(None, None, None, None, None)
+    sampled = MangaPdfConverter(None, None, None, None, None)
+    sampled.set_color_detection(sample_size=args.sample_size)
+
+    print(f'page size: {args.width}x{args.height}, best of {args.repeat}')
+    print(f'{"page":<12}{"legacy":>12}{"is_color":>12}{"sampled":>12}{"jpeg full":>12}{"jpeg draft":>12}{"speedup":>10}')
+    for name, img in make_pages(args.width, args.height).items():
+        jpeg = io.BytesIO()
+        img.save(jpeg, 'JPEG', quality=95)
+        jpeg_data = jpeg.getvalue()
+        legacy_time, legacy_result = measure(legacy_is_color, img, args.repeat)
+        new_time, new_result = measure(converter.is_color, img, args.repeat)
+        sampled_time, _ = measure(sampled.is_color, img, args.repeat)
+        jpeg_time, _ = measure(lambda data: is_color_data(converter, data), jpeg_data, args.repeat)
+        draft_time, _ = measure(lambda data: is_color_data(sampled, data), jpeg_data, args.repeat)
+        assert legacy_result == new_result, name
+        print(f'{name:<12}{legacy_time * 1000:>10.1f}ms{new_time * 1000:>10.1f}ms{sampled_time * 1000:>10.1f}ms'
+              f'{jpeg_time * 1000:>10.1f}ms{draft_time * 1000:>10.1f}ms{legacy_time / new_time:>9.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+# Micro-benchmark of the page ordering bookkeeping: the natural sort of the file names and
+# the ordering of the converted pages, compared with the previous reordering by img_files.index.
+#
+#   $ python benchmarks/bench_page_order.py [--sizes 1000 10000 100000]
+
+import os
+import sys
+import time
+import random
+import argparse
+import concurrent.futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from manga2pdf.manga2pdf import MangaPdfConverter
+
+# Reader returning empty data, so that only the bookkeeping is measured
+class NullReader():
+    def read(self, name):
+        return b''
+
+# Function to generate shuffled file names of a scanlation dump
+def make_names(count):
+    names = [f'Vol{volume:02d}/Chapter {chapter:03d}/page_{page:04d}.jpg'
+             for volume in range(1, count // 10000 + 2)
+             for chapter in range(1, 101)
+             for page in range(1, 101)][:count]
+    random.Random(0).shuffle(names)
+    return names
+
+# The reordering used before pages were ordered by their discovery index
+def legacy_reorder(img_files):
+    page_items = [(b'', img_file_path) for img_file_path in reversed(img_files)]
+    page_items.sort(key=lambda x: img_files.index(x[1]))
+    return [data[0] for data in page_items]
+
+def measure(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark of the page ordering')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-limit', type=int, default=20000,
+                        help='largest number of pages for the quadratic legacy reordering')
+    args = parser.parse_args()
+
+    converter = MangaPdfConverter(None, None, None, None, None)
+    print(f'{"pages":>8}{"sort_key":>12}{"ordering":>12}{"legacy":>12}')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        for size in args.sizes:
+            names = make_names(size)
+            sort_time = measure(lambda: sorted(names, key=converter.sort_key))
+            img_files = sorted(names, key=converter.sort_key)
+            order_time = measure(lambda: list(converter.iter_page_items(NullReader(), img_files, executor, 8)))
+            if size <= args.legacy_limit:
+                legacy = f'{measure(legacy_reorder, img_files) * 1000:>10.1f}ms'
+            else:
+                legacy = f'{"skipped":>12}'
+            print(f'{size:>8}{sort_time * 1000:>10.1f}ms{order_time * 1000:>10.1f}ms{legacy}')
+
+if __name__ == '__main__':
+    main()
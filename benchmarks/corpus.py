@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+# Generator of synthetic manga books for the benchmarks.
+# Each book mixes JPEG, PNG with alpha, palette, grayscale and color pages, and is written in every supported container.
+#
+#   $ python benchmarks/corpus.py OUTPUT_DIR [--pages 40] [--width 1200] [--height 1800]
+
+import io
+import os
+import sys
+import random
+import shutil
+import tarfile
+import zipfile
+import argparse
+import py7zr
+from PIL import Image, ImageDraw
+
+PAGE_KINDS = ['jpeg', 'png_alpha', 'palette', 'grayscale', 'color']
+CONTAINERS = ['cbz', 'cbr', 'cb7', 'cbt', 'dir', 'epub']
+
+# Function to draw a page with panels, speech balloons, text lines and screentone
+def draw_page(number, width, height, color):
+    rng = random.Random(number)
+    img = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    margin = width // 20
+    # Panels
+    rows = rng.randint(2, 4)
+    panel_height = (height - margin * 2) // rows
+    for row in range(rows):
+        top = margin + row * panel_height
+        split = rng.randint(width // 3, width * 2 // 3)
+        for left, right in [(margin, split - margin // 4), (split + margin // 4, width - margin)]:
+            box = (left, top + margin // 4, right, top + panel_height - margin // 4)
+            fill = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)) if color else (rng.randint(180, 255),) * 3
+            draw.rectangle(box, fill=fill, outline=(0, 0, 0), width=max(2, width // 300))
+            # Screentone
+            step = max(4, width // 200)
+            for y in range(box[1] + step, box[3], step * 2):
+                for x in range(box[0] + step, box[2], step * 2):
+                    draw.point((x, y), fill=(60, 60, 60))
+            # Speech balloon with text lines
+            balloon_width = (box[2] - box[0]) // 3
+            balloon_left = rng.randint(box[0], box[2] - balloon_width)
+            balloon = (balloon_left, box[1] + step * 2, balloon_left + balloon_width, box[1] + step * 2 + balloon_width)
+            draw.ellipse(balloon, fill=(255, 255, 255), outline=(0, 0, 0), width=2)
+            for line in range(3):
+                y = balloon[1] + balloon_width // 4 + line * balloon_width // 6
+                draw.line((balloon[0] + balloon_width // 4, y, balloon[2] - balloon_width // 4, y), fill=(0, 0, 0), width=2)
+    return img
+
+# Function to encode a page of the given kind and return its file name and data
+def make_page(number, kind, width, height):
+    img = draw_page(number, width, height, color=kind in ['color', 'png_alpha'])
+    buf = io.BytesIO()
+    if kind == 'jpeg':
+        img.save(buf, 'JPEG', quality=90)
+        ext = 'jpg'
+    elif kind == 'png_alpha':
+        img = img.convert('RGBA')
+        img.putalpha(Image.new('L', img.size, 250))
+        img.save(buf, 'PNG')
+        ext = 'png'
+    elif kind == 'palette':
+        img.convert('P', palette=Image.ADAPTIVE, colors=64).save(buf, 'PNG')
+        ext = 'png'
+    elif kind == 'grayscale':
+        img.convert('L').save(buf, 'PNG')
+        ext = 'png'
+    else:
+        img.save(buf, 'PNG')
+        ext = 'png'
+    return f'page_{number:04d}.{ext}', buf.getvalue()
+
+# Function to generate the pages of a book, cycling through the page kinds in the given mix
+def make_pages(num_pages, width, height, kinds=PAGE_KINDS):
+    return [make_page(number, kinds[number % len(kinds)], width, height) for number in range(1, num_pages + 1)]
+
+# Function to write a fixed-layout EPUB with an OPF manifest, an NCX table of contents and an XHTML page per image
+def write_epub(path, pages):
+    manifest = []
+    spine = []
+    nav_points = []
+    with zipfile.ZipFile(path, 'w') as epub:
+        epub.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        epub.writestr('META-INF/container.xml',
+                      '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+                      '<rootfiles><rootfile full-path="item/standard.opf" media-type="application/oebps-package+xml"/></rootfiles></container>')
+        for number, (name, data) in enumerate(pages):
+            media_type = 'image/jpeg' if name.endswith('.jpg') else 'image/png'
+            epub.writestr(f'item/image/{name}', data)
+            manifest.append(f'<item id="img{number}" href="image/{name}" media-type="{media_type}"/>')
+            epub.writestr(f'item/xhtml/p{number:04d}.xhtml',
+                          '<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml" xmlns:svg="http://www.w3.org/2000/svg" '
+                          'xmlns:xlink="http://www.w3.org/1999/xlink"><body><svg:svg>'
+                          f'<svg:image xlink:href="../image/{name}"/></svg:svg></body></html>')
+            manifest.append(f'<item id="p{number}" href="xhtml/p{number:04d}.xhtml" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="p{number}"/>')
+            if number % 10 == 0:
+                nav_points.append(f'<navPoint id="nav{number}"><navLabel><text>Chapter {number // 10 + 1}</text></navLabel>'
+                                  f'<content src="xhtml/p{number:04d}.xhtml"/></navPoint>')
+        manifest.append('<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>')
+        epub.writestr('item/standard.opf',
+                      '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+                      '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Benchmark</dc:title>'
+                      '<dc:creator>manga2pdf</dc:creator><dc:publisher>manga2pdf</dc:publisher>'
+                      '<dc:date>2025-01-01</dc:date><dc:language>ja</dc:language>'
+                      '<meta property="rendition:layout">pre-paginated</meta></metadata>'
+                      f'<manifest>{"".join(manifest)}</manifest><spine toc="ncx">{"".join(spine)}</spine></package>')
+        epub.writestr('item/toc.ncx',
+                      '<?xml version="1.0"?><ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+                      f'<navMap>{"".join(nav_points)}</navMap></ncx>')
+
+# Function to write a book in the given container and return its path
+# The cbr book is a zip archive saved with the .cbr extension, as many comic archives are,
+# because RAR archives cannot be created without the proprietary rar tool
+def write_book(out_dir, container, pages, name='book'):
+    if container == 'dir':
+        path = os.path.join(out_dir, f'{name}_dir')
+        os.makedirs(path, exist_ok=True)
+        for page_name, data in pages:
+            with open(os.path.join(path, page_name), 'wb') as f:
+                f.write(data)
+    elif container in ['cbz', 'cbr']:
+        path = os.path.join(out_dir, f'{name}.{container}')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for page_name, data in pages:
+                archive.writestr(page_name, data)
+    elif container == 'cb7':
+        path = os.path.join(out_dir, f'{name}.cb7')
+        with py7zr.SevenZipFile(path, 'w') as archive:
+            for page_name, data in pages:
+                archive.writestr(data, page_name)
+    elif container == 'cbt':
+        path = os.path.join(out_dir, f'{name}.cbt')
+        with tarfile.open(path, 'w') as archive:
+            for page_name, data in pages:
+                info = tarfile.TarInfo(page_name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    elif container == 'epub':
+        path = os.path.join(out_dir, f'{name}.epub')
+        write_epub(path, pages)
+    else:
+        raise ValueError(f'{container} is not a supported container.')
+    return path
+
+# Function to generate a book in each of the given containers and return their paths by container
+def generate_corpus(out_dir, num_pages=40, width=1200, height=1800, kinds=PAGE_KINDS, containers=CONTAINERS):
+    os.makedirs(out_dir, exist_ok=True)
+    pages = make_pages(num_pages, width, height, kinds)
+    return {container: write_book(out_dir, container, pages) for container in containers}
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic manga books for the benchmarks')
+    parser.add_argument('output_dir')
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=1800)
+    parser.add_argument('--kinds', nargs='+', default=PAGE_KINDS, choices=PAGE_KINDS)
+    parser.add_argument('--containers', nargs='+', default=CONTAINERS, choices=CONTAINERS)
+    parser.add_argument('--clean', action='store_true', help='remove the output directory first')
+    args = parser.parse_args()
+    if args.clean:
+        shutil.rmtree(args.output_dir, ignore_errors=True)
+    books = generate_corpus(args.output_dir, args.pages, args.width, args.height, args.kinds, args.containers)
+    for container, path in books.items():
+        print(f'{container}: {path}')
+
+if __name__ == '__main__':
+    sys.exit(main())
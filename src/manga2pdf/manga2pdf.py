@@ -6,24 +6,563 @@ import io
 import os
 import re
 import sys
-import py7zr
-import img2pdf
-import pikepdf
 import tarfile
-import rarfile
 import zipfile
+import glob
+import json
+import hashlib
+import shutil
+import subprocess
+import time
 import argparse
+import threading
+import contextlib
 import tempfile
+import posixpath
+import urllib.parse
 import warnings
-import numpy as np
-from PIL import Image
-from lxml import etree
 import concurrent.futures
 
 warnings.filterwarnings('ignore', category=UserWarning)
 
+# The image, PDF, XML and archive libraries take most of the startup time, so they are imported
+# by the functions that use them. `manga2pdf --version` or a book of JPEG files does not load NumPy or py7zr.
+
 __version__ = "0.3.1"
 
+# Pattern to split file names into text and numbers for the natural sort order
+NUMBER_PATTERN = re.compile(r'(\d+)')
+
+# Screen sizes (width, height) of reading devices for the --device option
+DEVICE_PRESETS = {
+    'kindle-paperwhite': (1236, 1648),
+    'kindle-oasis': (1264, 1680),
+    'kindle-scribe': (1860, 2480),
+    'kobo-clara': (1072, 1448),
+    'kobo-libra': (1264, 1680),
+    'kobo-elipsa': (1404, 1872),
+    'ipad': (1640, 2360),
+    'ipad-mini': (1488, 2266),
+}
+
+# Lowest JPEG quality tried to fit a page in its share of the target size
+MIN_JPEG_QUALITY = 10
+
+# DPI that img2pdf assumes for images without a resolution
+DEFAULT_DPI = 96.0
+
+# Long side in pixels of the reduced copy of a page on which its margins are detected
+CROP_SAMPLE_SIZE = 256
+
+# Pages are not cropped to less than CROP_MIN_RATIO of their width or height (e.g. a blank page with a small logo)
+CROP_MIN_RATIO = 0.5
+
+# Pages at least SPREAD_MIN_ASPECT times wider than tall are two-page spreads
+SPREAD_MIN_ASPECT = 1.2
+
+# The gutter of a spread is looked for in the middle SPREAD_GUTTER_BAND of its width, and is used when its column varies
+# less than SPREAD_GUTTER_RATIO times the median column of that band (otherwise the spread is split in the middle)
+SPREAD_GUTTER_BAND = 0.2
+SPREAD_GUTTER_RATIO = 0.5
+
+# Columns that vary less than the least varying column plus SPREAD_GUTTER_TOLERANCE times the median column
+# are part of the gutter (e.g. the whole white gap between the pages, despite the noise of JPEG compression)
+SPREAD_GUTTER_TOLERANCE = 0.05
+
+# Pixels darker than BITONAL_MARGIN or lighter than 255 - BITONAL_MARGIN count as black or white in the bitonal detection
+BITONAL_MARGIN = 64
+
+# Class to read image files from a directory with the same interface as the archive readers
+class DirectoryReader():
+    def __init__(self, path):
+        self.path = path
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+    def namelist(self):
+        names = []
+        for root, _, files in os.walk(self.path):
+            for file in files:
+                names.append(os.path.join(root, file))
+        return names
+    def prepare(self, names):
+        pass
+    def read(self, name):
+        with open(name, 'rb') as f:
+            return f.read()
+    def close(self):
+        pass
+
+# Class to read members of a zip/cbz archive without extracting them to disk
+class ZipArchiveReader(DirectoryReader):
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path)
+    def namelist(self):
+        return [info.filename for info in self.archive.infolist() if not info.is_dir()]
+    def read(self, name):
+        return self.archive.read(name)
+    def close(self):
+        self.archive.close()
+
+# Class to read members of a tar/cbt archive without extracting them to disk
+# The archive is a path or a binary file object
+class TarArchiveReader(DirectoryReader):
+    def __init__(self, path):
+        self.path = path
+        if isinstance(path, (str, os.PathLike)):
+            self.archive = tarfile.open(path, 'r')
+        else:
+            self.archive = tarfile.open(fileobj=path, mode='r')
+        self.members = {member.name: member for member in self.archive.getmembers() if member.isfile()}
+    def namelist(self):
+        return list(self.members)
+    def read(self, name):
+        with self.archive.extractfile(self.members[name]) as f:
+            return f.read()
+    def close(self):
+        self.archive.close()
+
+# Class to read members of a rar/cbr archive one by one through rarfile
+# A member of a solid archive can only be decompressed after all the members before it, so reading the pages one by one
+# decompresses the archive again for each page. For solid archives, prepare() runs the unrar tool once, reads the members
+# in stream order and keeps the image members in tmp_dir, stopping after the last image.
+class RarArchiveReader(DirectoryReader):
+    def __init__(self, path, tmp_dir):
+        import rarfile
+        self.path = path
+        self.tmp_dir = tmp_dir
+        self.archive = rarfile.RarFile(path)
+        # Members extracted by prepare(): name -> path in tmp_dir
+        self.extracted = {}
+    def namelist(self):
+        return [info.filename for info in self.archive.infolist() if not info.is_dir()]
+    def prepare(self, names):
+        # The tool reads the archive from its path, so archives given as streams are read member by member
+        if not isinstance(self.path, (str, os.PathLike)) or not self.archive.is_solid() or self.archive.needs_password():
+            return
+        try:
+            self.extract_solid(set(names))
+        except Exception:
+            # Fall back to reading the members one by one (e.g. if the tool cannot print the whole archive)
+            self.extracted = {}
+    def extract_solid(self, names):
+        import rarfile
+        import zlib
+        # The tool prints the content of every file member one after another in archive order
+        members = [info for info in self.archive.infolist() if info.is_file()]
+        command = rarfile.tool_setup().open_cmdline(None, os.fspath(self.path))
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            for number, info in enumerate(members):
+                if len(self.extracted) == len(names):
+                    break
+                data = process.stdout.read(info.file_size)
+                # The CRC check catches a tool that skips or reorders members
+                if len(data) != info.file_size or (info.CRC is not None and zlib.crc32(data) != info.CRC):
+                    raise rarfile.BadRarFile(f'Unexpected data for {info.filename} in the output of {command[0]}.')
+                if info.filename in names:
+                    path = os.path.join(self.tmp_dir, f'rar{number}')
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                    self.extracted[info.filename] = path
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.wait()
+    def read(self, name):
+        if name in self.extracted:
+            with open(self.extracted[name], 'rb') as f:
+                return f.read()
+        return self.archive.read(name)
+    def close(self):
+        self.archive.close()
+
+# Class to read members of a 7z/cb7 archive
+# py7zr cannot read a single member cheaply, so the image members are extracted to tmp_dir in one pass by prepare()
+class SevenZipArchiveReader(DirectoryReader):
+    def __init__(self, path, tmp_dir):
+        self.path = path
+        self.tmp_dir = tmp_dir
+        import py7zr
+        self.archive = py7zr.SevenZipFile(path, mode='r')
+    def namelist(self):
+        return [info.filename for info in self.archive.list() if not info.is_directory]
+    def prepare(self, names):
+        self.archive.extract(path=self.tmp_dir, targets=list(names))
+    def read(self, name):
+        with open(os.path.join(self.tmp_dir, name), 'rb') as f:
+            return f.read()
+    def close(self):
+        self.archive.close()
+
+# Class to read a fixed-layout EPUB package, parsing the container, the OPF and the NCX once
+# The page images are listed in spine (reading) order and are read lazily like the members of a zip archive
+class EpubPackage(ZipArchiveReader):
+    NAMESPACES = {
+        'container': 'urn:oasis:names:tc:opendocument:xmlns:container',
+        'dc': 'http://purl.org/dc/elements/1.1/',
+        'opf': 'http://www.idpf.org/2007/opf',
+        'ncx': 'http://www.daisy.org/z3986/2005/ncx/',
+        'html': 'http://www.w3.org/1999/xhtml',
+        'svg': 'http://www.w3.org/2000/svg',
+    }
+    # Media types of the pages whose images are looked up
+    PAGE_MEDIA_TYPES = ['application/xhtml+xml', 'text/html', 'image/svg+xml']
+    def __init__(self, path):
+        from lxml import etree
+        super().__init__(path)
+        self.names = set(self.archive.namelist())
+        self.opf_name = self.find_opf_name()
+        opf_tree = etree.fromstring(self.archive.read(self.opf_name))
+        # Manifest items by id, with their hrefs resolved to member names
+        self.manifest = {}
+        for item in opf_tree.iterfind('opf:manifest/opf:item', namespaces=self.NAMESPACES):
+            self.manifest[item.get('id')] = (self.resolve(self.opf_name, item.get('href')), item.get('media-type'))
+        self.image_names = [name for name, media_type in self.manifest.values() if media_type in ['image/jpeg', 'image/png']]
+        self.media_types = {name: media_type for name, media_type in self.manifest.values()}
+        # Images of the XHTML pages by member name, parsed once for the spine and the table of contents
+        self.xhtml_images = {}
+        self.page_names = self.parse_spine(opf_tree)
+        self.page_numbers = {name: number for number, name in enumerate(self.page_names)}
+        self.metadata = self.parse_metadata(opf_tree)
+        self.ncx_name = self.find_ncx_name(opf_tree)
+        self.page_index = self.parse_index() if self.ncx_name is not None else []
+    # Function to resolve an href relative to the member that contains it
+    def resolve(self, base_name, href):
+        href = urllib.parse.unquote(href.split('#')[0])
+        return posixpath.normpath(posixpath.join(posixpath.dirname(base_name), href))
+    # Function to get the page images in the order of the spine itemrefs
+    # Each itemref is a page image, or an XHTML page whose images are looked up. An image is only listed once.
+    # The images of the manifest that no page of the spine shows follow in manifest order, so no image is dropped.
+    def parse_spine(self, opf_tree):
+        image_names = set(self.image_names)
+        page_names = []
+        for itemref in opf_tree.iterfind('opf:spine/opf:itemref', namespaces=self.NAMESPACES):
+            if itemref.get('idref') not in self.manifest:
+                continue
+            name, media_type = self.manifest[itemref.get('idref')]
+            if media_type in self.PAGE_MEDIA_TYPES:
+                names = self.find_xhtml_images(name)
+            else:
+                names = [name]
+            for name in names:
+                if name in image_names:
+                    page_names.append(name)
+                    # Images shown on several pages, e.g. a background, are listed at their first page
+                    image_names.discard(name)
+        page_names.extend(name for name in self.image_names if name in image_names)
+        return page_names
+    # Function to get the images of an XHTML page, in document order
+    # The page is parsed by a recovering parser, since text pages often use HTML entities such as &nbsp; that XML does not define.
+    # Members of the manifest that are not pages (e.g. images) are not parsed.
+    def find_xhtml_images(self, xhtml_name):
+        from lxml import etree
+        if xhtml_name not in self.xhtml_images:
+            images = []
+            if xhtml_name in self.names and self.media_types.get(xhtml_name, self.PAGE_MEDIA_TYPES[0]) in self.PAGE_MEDIA_TYPES:
+                xhtml_tree = etree.fromstring(self.archive.read(xhtml_name), etree.XMLParser(recover=True))
+                img_tags = xhtml_tree.xpath('.//svg:image | .//html:img', namespaces=self.NAMESPACES) if xhtml_tree is not None else []
+                for img_tag in img_tags:
+                    # SVG 2 links images with a plain href
+                    img_link = img_tag.get('{http://www.w3.org/1999/xlink}href', img_tag.get('href', img_tag.get('src')))
+                    if img_link is not None:
+                        images.append(self.resolve(xhtml_name, img_link))
+            self.xhtml_images[xhtml_name] = images
+        return self.xhtml_images[xhtml_name]
+    # Function to find the OPF file from META-INF/container.xml, or by its extension if the container is missing
+    def find_opf_name(self):
+        from lxml import etree
+        if 'META-INF/container.xml' in self.names:
+            container_tree = etree.fromstring(self.archive.read('META-INF/container.xml'))
+            rootfile = container_tree.find('.//container:rootfile', namespaces=self.NAMESPACES)
+            if rootfile is not None and rootfile.get('full-path') in self.names:
+                return rootfile.get('full-path')
+        return self.find_by_extension('opf')
+    # Function to find the NCX file from the spine toc attribute, or by its extension
+    def find_ncx_name(self, opf_tree):
+        spine = opf_tree.find('opf:spine', namespaces=self.NAMESPACES)
+        if spine is not None and spine.get('toc') in self.manifest:
+            return self.manifest[spine.get('toc')][0]
+        return self.find_by_extension('ncx')
+    # Function to find a member by its extension, preferring the names containing 'standard'
+    def find_by_extension(self, extension):
+        names = [name for name in self.archive.namelist() if name.split('.')[-1].lower() == extension]
+        for name in names:
+            if 'standard' in name:
+                return name
+        return names[0] if names else None
+    # Function to get the title, creators, publisher, date and language of the book
+    def parse_metadata(self, opf_tree):
+        metadata = opf_tree.find('opf:metadata', namespaces=self.NAMESPACES)
+        epub_metadata = {}
+        for key in ['title', 'creator', 'publisher', 'date', 'language']:
+            values = metadata.findall('dc:' + key, namespaces=self.NAMESPACES) if metadata is not None else []
+            if key == 'creator':
+                epub_metadata[key] = [value.text for value in values] if values else None
+            else:
+                epub_metadata[key] = values[0].text if values else None
+        return epub_metadata
+    # Function to get the table of contents as a list of [label, page number]
+    # Each nav point points to a page image, or to an XHTML page whose first image is looked up
+    def parse_index(self):
+        from lxml import etree
+        page_index = []
+        ncx_tree = etree.fromstring(self.archive.read(self.ncx_name))
+        for navpoint in ncx_tree.iterfind('ncx:navMap/ncx:navPoint', namespaces=self.NAMESPACES):
+            label = navpoint.find('ncx:navLabel/ncx:text', namespaces=self.NAMESPACES)
+            content = navpoint.find('ncx:content', namespaces=self.NAMESPACES)
+            if label is None or content is None:
+                continue
+            target = self.resolve(self.ncx_name, content.get('src'))
+            if target not in self.page_numbers:
+                images = self.find_xhtml_images(target)
+                if images:
+                    target = images[0]
+            if target in self.page_numbers:
+                page_index.append([(label.text or '').strip(), self.page_numbers[target]])
+        return page_index
+
+# Functions to detect RAR and 7z archives, importing rarfile and py7zr only when another format did not match
+def is_rarfile(path):
+    import rarfile
+    return rarfile.is_rarfile(path)
+
+def is_7zfile(path):
+    import py7zr
+    return py7zr.is_7zfile(path)
+
+# Class to store converted page images on disk, keyed by a hash of the source image and the conversion options
+# The least recently used images are removed when the cache grows beyond max_size bytes
+# A durable store (the checkpoint of --resume) writes each image to disk before renaming it into place, preceded by its SHA-256 digest,
+# and removes the images that do not match their digest, e.g. truncated by a crash of the host
+class PageCache():
+    def __init__(self, cache_dir, max_size, durable=False):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.durable = durable
+        os.makedirs(cache_dir, exist_ok=True)
+    def key(self, img_data, options):
+        digest = hashlib.sha256(repr((__version__, options)).encode('utf-8'))
+        digest.update(img_data)
+        return digest.hexdigest()
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                img_data = f.read()
+        except OSError:
+            return None
+        if self.durable:
+            digest_size = hashlib.sha256().digest_size
+            digest, img_data = img_data[:digest_size], img_data[digest_size:]
+            if hashlib.sha256(img_data).digest() != digest:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                return None
+        # Mark the image as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return img_data
+    def put(self, key, img_data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.durable:
+            try:
+                write_atomically(path, lambda f: f.writelines([hashlib.sha256(img_data).digest(), img_data]))
+            except OSError:
+                pass
+            return
+        # Write to a temporary file first so that other processes never read a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(img_data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    def evict(self):
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+        if total_size <= self.max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+# Function to write a file to a temporary file in the same directory and rename it over the destination once it is complete
+# The data is flushed to disk before the rename, so a crash or a kill leaves either the previous file or the new one, never a partial file
+# write is called with the binary file object of the temporary file
+def write_atomically(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # Flush the rename itself (directories cannot be opened on Windows)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# Function to get the peak resident set size of the process in bytes (None if it is not available on the platform)
+def get_peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+# Function to run a function in a worker of the pool and return its result with the usage of the worker:
+# the CPU time of the worker thread, the id of the worker process and its peak RSS
+# The worker processes of a process pool are not seen by the metrics of the converting process.
+def run_measured(func, *args):
+    start_cpu_time = time.thread_time()
+    result = func(*args)
+    return result, (time.thread_time() - start_cpu_time, os.getpid(), get_peak_rss())
+
+# Class to record the wall time, CPU time, bytes in and out and page count of each stage of a conversion
+# The time of a stage nested in another stage is not counted in the outer stage.
+# The CPU time of a stage is that of the thread running the stage, plus the CPU time of the pool workers added with add_usage,
+# so the work of the worker threads or processes is counted once, in the stage that submitted it.
+# The peak RSS is only measured for the whole conversion: the converting process, and the largest of the worker processes.
+class ConversionMetrics():
+    def __init__(self):
+        self.stages = {}
+        self.stack = []
+        self.start_wall_time = time.perf_counter()
+        self.start_cpu_time = time.process_time()
+        # CPU time and peak RSS of the worker processes
+        self.worker_cpu_time = 0.0
+        self.worker_peak_rss = None
+    def get_stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'wall_time': 0.0, 'cpu_time': 0.0, 'bytes_in': 0, 'bytes_out': 0, 'pages': 0}
+        return self.stages[name]
+    @contextlib.contextmanager
+    def stage(self, name):
+        stage = self.get_stage(name)
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+        self.stack.append(stage)
+        try:
+            yield stage
+        finally:
+            self.stack.pop()
+            wall_time = time.perf_counter() - start_wall_time
+            cpu_time = time.thread_time() - start_cpu_time
+            stage['wall_time'] += wall_time
+            stage['cpu_time'] += cpu_time
+            if self.stack:
+                self.stack[-1]['wall_time'] -= wall_time
+                self.stack[-1]['cpu_time'] -= cpu_time
+    def add(self, name, bytes_in=0, bytes_out=0, pages=0):
+        stage = self.get_stage(name)
+        stage['bytes_in'] += bytes_in
+        stage['bytes_out'] += bytes_out
+        stage['pages'] += pages
+    # Function to add the usage returned by run_measured to a stage (usage is None for the pages that were not converted)
+    def add_usage(self, name, usage):
+        if usage is None:
+            return
+        cpu_time, pid, peak_rss = usage
+        self.get_stage(name)['cpu_time'] += cpu_time
+        if pid != os.getpid():
+            self.worker_cpu_time += cpu_time
+            if peak_rss is not None:
+                self.worker_peak_rss = max(self.worker_peak_rss or 0, peak_rss)
+    def to_dict(self):
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage, wall_time=round(stage['wall_time'], 6), cpu_time=round(stage['cpu_time'], 6))
+        return {
+            'wall_time': round(time.perf_counter() - self.start_wall_time, 6),
+            'cpu_time': round(time.process_time() - self.start_cpu_time + self.worker_cpu_time, 6),
+            'peak_rss': get_peak_rss(),
+            'worker_peak_rss': self.worker_peak_rss,
+            'stages': stages,
+        }
+
+# Class to record the fingerprints of converted books in a JSON file, so that unchanged books can be skipped
+# The entries are keyed by the absolute path of the output PDF file
+class ConversionIndex():
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+    # Function to determine whether the output PDF file was created from the same input and options
+    def is_up_to_date(self, converter):
+        output_path = os.path.abspath(converter.get_output_path())
+        entry = self.entries.get(output_path)
+        if entry is None or entry['fingerprint'] != converter.get_fingerprint():
+            return False
+        # The output PDF file must not have been removed or replaced since it was recorded
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return False
+        return entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns
+    def record(self, converter):
+        output_path = os.path.abspath(converter.get_output_path())
+        stat = os.stat(output_path)
+        with self.lock:
+            self.entries[output_path] = {
+                'input': os.path.abspath(converter.input_path),
+                'fingerprint': converter.get_fingerprint(),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+            }
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.entries, ensure_ascii=False, indent=1).encode('utf-8')
+            write_atomically(self.index_path, lambda f: f.write(data))
+
+# Exception raised by MangaPdfConverter.convert when the conversion is canceled
+class ConversionCanceled(Exception):
+    pass
+
 class MangaPdfConverter():   
     def __init__(self, input_path: str, output_path: str, pagelayout:str, pagemode:str, direction:str):
         self.input_path = input_path
@@ -33,14 +572,176 @@ class MangaPdfConverter():
         self.direction = direction
         self.convert_to_grayscale = False
         self.convert_to_jpeg = False
+        self.convert_to_bitonal = False
+        self.memory_limit = None
+        self.executor_type = 'thread'
+        self.max_workers = None
+        self.color_threshold = 0.5
+        self.color_min_ratio = 0.0
+        self.color_sample_size = None
+        self.bitonal_max_gray_ratio = 0.05
+        self.bitonal_threshold = 128
+        self.target_width = None
+        self.target_height = None
+        self.max_dpi = None
+        self.dedup = True
+        self.auto_crop = False
+        self.crop_tolerance = 0.1
+        self.crop_uniform = False
+        self.book_crop_box = None
+        self.spread_mode = 'keep'
+        self.jpeg_quality = 75
+        self.jpeg_subsampling = None
+        self.jpeg_progressive = False
+        self.jpeg_optimize = False
+        self.jpeg_grayscale = True
+        self.target_file_size = None
+        self.page_budget = None
+        self.page_counts = {'passthrough': 0, 'cached': 0, 'transcoded': 0}
+        # Image files of the spreads split into two pages in the current conversion
+        self.split_pages = []
+        self.num_pages = 0
+        self.executor = None
+        self.cache = None
+        self.resume = False
+        self.checkpoint = None
+        self.metrics = ConversionMetrics()
+        self.metrics_callback = None
+        self.progress_callback = None
+        self.cancel_event = threading.Event()
+        self.metadata = None
+        self.input_stream = None
+        self.input_format = None
+        self.output_stream = None
+    # The executor, the metrics, the callbacks, the cancel event and the streams are not sent to the worker processes along with the converter
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['input_stream'] = None
+        state['output_stream'] = None
+        state['executor'] = None
+        state['metrics'] = None
+        state['metrics_callback'] = None
+        state['progress_callback'] = None
+        state['cancel_event'] = None
+        return state
     def set_convert_to_jpeg(self, flag):
         self.convert_to_jpeg = flag
     def set_convert_to_grayscale(self, flag):
         self.convert_to_grayscale = flag
+    # Set whether black-and-white pages are stored as 1-bit images (CCITT Group 4), the other pages as in the grayscale mode
+    def set_convert_to_bitonal(self, flag):
+        self.convert_to_bitonal = flag
+    # Set the maximum number of bytes of page images held in memory while assembling the PDF (None for no limit)
+    def set_memory_limit(self, limit):
+        self.memory_limit = limit
+    # Set the pool used to convert the images: 'thread', 'process' or 'auto'
+    def set_executor_type(self, executor_type):
+        if executor_type not in ['thread', 'process', 'auto']:
+            raise ValueError(f'{executor_type} is not a valid executor type.')
+        self.executor_type = executor_type
+    # Set the number of image conversion workers (None for the default of the pool)
+    def set_max_workers(self, max_workers):
+        self.max_workers = max_workers
+    # Set the directory of the cache of converted images and its maximum size in bytes (None to disable the cache)
+    def set_cache(self, cache_dir, max_size=1024 * 1024 * 1024):
+        self.cache = PageCache(cache_dir, max_size) if cache_dir is not None else None
+    # Set whether the converted images are also kept in a checkpoint directory next to the output PDF file until the PDF is saved,
+    # so that a conversion that was interrupted or killed resumes from the pages already converted
+    def set_resume(self, flag):
+        self.resume = flag
+    # Function to get the checkpoint directory of the output PDF file (hidden, next to it)
+    def get_checkpoint_dir(self):
+        output_path = self.get_output_path()
+        return os.path.join(os.path.dirname(os.path.abspath(output_path)), f'.{os.path.basename(output_path)}.checkpoint')
+    # Set a function called with the metrics of each stage (a dict) when a conversion is finished
+    def set_metrics_callback(self, callback):
+        self.metrics_callback = callback
+    # Set a function called with the number of pages done and the total number of pages each time a page is converted
+    # The function is called from the thread running convert()
+    def set_progress_callback(self, callback):
+        self.progress_callback = callback
+    # Request the running conversion to stop; convert() raises ConversionCanceled at the next page and the converter stays canceled
+    # This can be called from any thread
+    def cancel(self):
+        self.cancel_event.set()
+    # Function to raise ConversionCanceled if the conversion has been canceled
+    def check_canceled(self):
+        if self.cancel_event.is_set():
+            raise ConversionCanceled(f'The conversion of {self.input_path or "the input stream"} was canceled.')
+    # Set the book to convert as bytes or a binary file object instead of input_path
+    # input_format is the extension of the book (e.g. 'cbz' or '.epub'); the archive format is still detected from the content
+    # File objects that cannot seek are read into memory
+    def set_input_stream(self, stream, input_format):
+        ext = '.' + input_format.lower().lstrip('.')
+        if not self.is_archive_file('input' + ext) and not self.is_epub_file('input' + ext):
+            raise ValueError(f'{input_format} is not a supported input format.')
+        if isinstance(stream, (bytes, bytearray, memoryview)):
+            stream = io.BytesIO(stream)
+        elif not stream.seekable():
+            stream = io.BytesIO(stream.read())
+        self.input_stream = stream
+        self.input_format = ext
+    # Set a binary file object the PDF is written to instead of output_path (None to write to output_path)
+    def set_output_stream(self, stream):
+        self.output_stream = stream
+    # Set a pool shared with other converters to convert the images (None to create a pool for each conversion)
+    # max_workers should be set to the number of workers of the shared pool
+    def set_executor(self, executor):
+        self.executor = executor
+    # Set the parameters of the color detection used by the grayscale conversion
+    def set_color_detection(self, threshold=0.5, min_ratio=0.0, sample_size=None):
+        self.color_threshold = threshold
+        self.color_min_ratio = min_ratio
+        self.color_sample_size = sample_size
+    # Set the parameters of the bitonal detection: the largest ratio of mid-gray pixels of a black-and-white page,
+    # and the gray level (0 to 255) from which a pixel becomes white
+    def set_bitonal_detection(self, max_gray_ratio=0.05, threshold=128):
+        self.bitonal_max_gray_ratio = max_gray_ratio
+        self.bitonal_threshold = threshold
+    # Set the size in pixels that the pages are reduced to fit in (None for no limit), e.g. the screen of a reading device
+    # Pages that are already small enough are not resampled
+    def set_target_size(self, width=None, height=None):
+        self.target_width = width
+        self.target_height = height
+    # Set the resolution above which the pages are reduced (None for no limit)
+    # The resolution of an image without one is taken as 96 DPI, as img2pdf does
+    def set_max_dpi(self, max_dpi):
+        self.max_dpi = max_dpi
+    # Set the JPEG encoder settings: the quality (1 to 95), the chroma subsampling ('4:4:4', '4:2:2', '4:2:0' or None for the
+    # default of the quality), progressive and optimized encoding, and whether the pages without color are stored as grayscale JPEG
+    def set_jpeg_options(self, quality=75, subsampling=None, progressive=False, optimize=False, grayscale=True):
+        self.jpeg_quality = quality
+        self.jpeg_subsampling = subsampling
+        self.jpeg_progressive = progressive
+        self.jpeg_optimize = optimize
+        self.jpeg_grayscale = grayscale
+    # Set the size in bytes that the book should fit in the JPEG mode (None for no limit)
+    # Each page gets an equal share, and the quality of the pages larger than their share is lowered until they fit
+    def set_target_file_size(self, target_file_size):
+        self.target_file_size = target_file_size
+    # Set whether the white or black margins of the pages are cropped
+    # A pixel is part of the content when it differs from the margin color by more than tolerance (0 to 1).
+    # If uniform is True, all pages are cropped by the same box, which contains the content of every page of the book.
+    def set_auto_crop(self, flag, tolerance=0.1, uniform=False):
+        self.auto_crop = flag
+        self.crop_tolerance = tolerance
+        self.crop_uniform = uniform
+    # Set how two-page spreads (pages wider than tall) are stored: 'keep' as one page, or 'split' into two pages in reading order
+    def set_spread_mode(self, spread_mode):
+        if spread_mode not in ['keep', 'split']:
+            raise ValueError(f'{spread_mode} is not a valid spread mode.')
+        self.spread_mode = spread_mode
+    # Set whether pages with identical images share a single image in the PDF (enabled by default)
+    def set_dedup(self, flag):
+        self.dedup = flag
+    # Set the metadata written to the PDF, replacing the metadata of an EPUB input
+    # creators is a list of names, and the dates are strings such as '2025-01-31 12:00:00'
+    def set_metadata(self, title=None, creators=None, publisher=None, create_date=None, modify_date=None):
+        self.metadata = {'title': title, 'creators': creators, 'publisher': publisher, 'create_date': create_date, 'modify_date': modify_date}
 
     # Function to determine w   hether the given file name is an image file or not
     def is_image_file(self, filename):
-        return any(filename.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp'])
+        return filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp'))
     
     # Function to determine whether the given path is an epub file or not
     def is_epub_file(self, path):
@@ -60,7 +761,7 @@ class MangaPdfConverter():
             key.append(True)
         else:
             key.append(False)
-        for s in re.split(r'(\d+)', filename):
+        for s in NUMBER_PATTERN.split(filename):
             if s.isdigit():
                 key.append(int(s))
             else:
@@ -71,239 +772,725 @@ class MangaPdfConverter():
             key.append(False)
         return tuple(key)
     
-    # Function that returns a list of paths to image files in the specified directory
-    def find_image_files(self, input_path, tmp_dir):
-        img_files = []
+    # Function to open the input directory, archive file or archive stream as a reader of its image files
+    # A stream is given with its extension as input_format
+    def open_archive(self, input_path, tmp_dir, input_format=None):
+        if input_format is not None:
+            ext = input_format
         # If the input_path is a directory
-        if os.path.isdir(input_path):
-            for root, _, files in os.walk(input_path):
-                for file in files:
-                    if self.is_image_file(file):
-                        img_files.append(os.path.join(root, file))
-        # If the input_path is a zip, cbz, rar, cbr, 7z, cb7, tar, or cbt file
-        elif self.is_archive_file(input_path):
-            ext = os.path.splitext(input_path)[1].lower()
-            if ext in ['.zip', '.cbz']:
-                if zipfile.is_zipfile(input_path):
-                    with zipfile.ZipFile(input_path) as archive:
-                        archive.extractall(tmp_dir)
-            elif ext in ['.rar', '.cbr']:
-                if rarfile.is_rarfile(input_path):
-                    with rarfile.RarFile(input_path) as archive:
-                        archive.extractall(tmp_dir)
-            elif ext in ['.7z', '.cb7']:
-                with py7zr.SevenZipFile(input_path, mode='r') as archive:
-                    archive.extractall(tmp_dir)
-            elif ext in ['.tar', '.cbt']:
-                with tarfile.open(input_path, 'r') as archive:
-                    archive.extractall(tmp_dir)
-            for root, _, files in os.walk(tmp_dir):
-                for file in files:
-                    if self.is_image_file(file):
-                        img_files.append(os.path.join(root, file))
+        elif os.path.isdir(input_path):
+            return DirectoryReader(input_path)
         # If the input_path is not a directory or archive file
-        else:
+        elif not self.is_archive_file(input_path):
             raise ValueError(f'{input_path} is not a directory or an archive file.')
+        else:
+            ext = os.path.splitext(input_path)[1].lower()
+        # Comic archives are often renamed (e.g. a zip file saved as .cbr), so the format is detected from the content
+        # The format suggested by the extension is tried first
+        formats = [
+            (['.zip', '.cbz'], zipfile.is_zipfile, lambda: ZipArchiveReader(input_path)),
+            (['.rar', '.cbr'], is_rarfile, lambda: RarArchiveReader(input_path, tmp_dir)),
+            (['.7z', '.cb7'], is_7zfile, lambda: SevenZipArchiveReader(input_path, tmp_dir)),
+            (['.tar', '.cbt'], tarfile.is_tarfile, lambda: TarArchiveReader(input_path)),
+        ]
+        formats.sort(key=lambda fmt: ext not in fmt[0])
+        for _, is_format, reader in formats:
+            # Each check reads a stream from its current position
+            if input_format is not None:
+                input_path.seek(0)
+            if is_format(input_path):
+                if input_format is not None:
+                    input_path.seek(0)
+                return reader()
+        raise ValueError(f'{input_path if input_format is None else "The input stream"} is not a supported archive file.')
+
+    # Function that returns a sorted list of the image files in the opened directory or archive file
+    def find_image_files(self, archive):
+        img_files = [name for name in archive.namelist() if self.is_image_file(name)]
         # Sort the list of image file paths by filename
         img_files.sort(key=self.sort_key)
+        # Let the reader unpack the images in advance if the format requires it
+        archive.prepare(img_files)
         return img_files
     
-    # Function to convert an image file to JPEG format and save it in a temporary directory
-    def to_jpeg(self, img_file_path, tmp_dir):
-        img_output_path = os.path.join(tmp_dir, os.path.basename(img_file_path)[:-4] + '.jpg')
-        with Image.open(img_file_path) as im:
-            im.convert('RGB').save(img_output_path, 'JPEG')
-        return img_output_path, img_file_path
+    # Function to determine whether pages are reduced by the target size or the maximum DPI
+    def is_reducing(self):
+        return self.target_width is not None or self.target_height is not None or self.max_dpi is not None
+
+    # Function to get the resolution of an image
+    def get_dpi(self, img):
+        dpi = img.info.get('dpi')
+        if dpi and max(dpi) > 0:
+            return float(max(dpi))
+        return DEFAULT_DPI
+
+    # Function to get the size to which an image is reduced, or None if it is small enough
+    def get_reduced_size(self, img):
+        if not self.is_reducing():
+            return None
+        scale = 1.0
+        if self.target_width is not None:
+            scale = min(scale, self.target_width / img.width)
+        if self.target_height is not None:
+            scale = min(scale, self.target_height / img.height)
+        if self.max_dpi is not None:
+            scale = min(scale, self.max_dpi / self.get_dpi(img))
+        if scale >= 1.0:
+            return None
+        return max(1, round(img.width * scale)), max(1, round(img.height * scale))
+
+    # Function to determine from the image header whether an image is reduced
+    def needs_reduction(self, img_data):
+        from PIL import Image
+        if not self.is_reducing():
+            return False
+        with Image.open(io.BytesIO(img_data)) as img:
+            return self.get_reduced_size(img) is not None
+
+    # Function to find the box (left, top, right, bottom) of the content of a page, or None if the page is blank
+    # The content is the pixels that differ from the margin color (the median of the border) by more than crop_tolerance.
+    # It is found with row and column reductions on a copy averaged down to about CROP_SAMPLE_SIZE pixels,
+    # which is fast and hides dust in the margins. The box is widened to whole pixels of the copy, so no content is cut.
+    def find_content_box(self, img):
+        import numpy as np
+        if img.mode not in ['L', 'RGB']:
+            img = img.convert('L')
+        factor = max(1, max(img.size) // CROP_SAMPLE_SIZE)
+        sample = img.reduce(factor) if factor > 1 else img
+        if sample.mode != 'L':
+            sample = sample.convert('L')
+        arr = np.asarray(sample, dtype=np.int16)
+        border = np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])
+        content = np.abs(arr - int(np.median(border))) > self.crop_tolerance * 255
+        rows = np.flatnonzero(content.any(axis=1))
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(content.any(axis=0))
+        return (int(cols[0]) * factor, int(rows[0]) * factor,
+                min(img.width, (int(cols[-1]) + 1) * factor), min(img.height, (int(rows[-1]) + 1) * factor))
+
+    # Function to find the content box of image data as fractions of the page size (used to find the crop box of a book)
+    def find_content_fractions(self, img_data):
+        from PIL import Image
+        with Image.open(io.BytesIO(img_data)) as img:
+            if img.format == 'JPEG':
+                img.draft(img.mode, (CROP_SAMPLE_SIZE, CROP_SAMPLE_SIZE))
+            box = self.find_content_box(img)
+            if box is None:
+                return None
+            return box[0] / img.width, box[1] / img.height, box[2] / img.width, box[3] / img.height
+
+    # Function to find the box of the book that contains the content of all pages, as fractions of the page size
+    # Blank pages and spreads to split are ignored. The pages are read and examined by the executor, at most window pages at a time.
+    def find_book_crop_box(self, archive, img_files, executor, window):
+        boxes = []
+        pending = set()
+        for img_file_path in img_files:
+            self.check_canceled()
+            if len(pending) >= window:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                boxes.extend(future.result() for future in done)
+            img_data = archive.read(img_file_path)
+            if not self.is_spread(img_data):
+                pending.add(executor.submit(run_measured, self.find_content_fractions, img_data))
+        boxes.extend(future.result() for future in concurrent.futures.wait(pending)[0])
+        for _, usage in boxes:
+            self.metrics.add_usage('crop', usage)
+        boxes = [box for box, _ in boxes if box is not None]
+        if not boxes:
+            return None
+        return min(box[0] for box in boxes), min(box[1] for box in boxes), max(box[2] for box in boxes), max(box[3] for box in boxes)
+
+    # Function to get the box to which a page is cropped, or None if it is not cropped
+    def get_crop_box(self, img):
+        import math
+        if not self.auto_crop:
+            return None
+        # The pages of a split spread are cropped one by one, since their content reaches the gutter
+        if self.crop_uniform and 'region' not in img.info:
+            if self.book_crop_box is None:
+                return None
+            left, top, right, bottom = self.book_crop_box
+            box = (int(left * img.width), int(top * img.height), math.ceil(right * img.width), math.ceil(bottom * img.height))
+        else:
+            box = self.find_content_box(img)
+            if box is None:
+                return None
+        if box == (0, 0, img.width, img.height) \
+            or box[2] - box[0] < CROP_MIN_RATIO * img.width or box[3] - box[1] < CROP_MIN_RATIO * img.height:
+            return None
+        return box
+
+    # Function to determine whether an opened image was split, cropped or reduced, so that it has to be encoded again
+    def is_transformed(self, img):
+        return 'region' in img.info or 'crop_box' in img.info or 'reduced_dpi' in img.info
+
+    # Function to determine from the image header whether a page is a spread to split
+    def is_spread(self, img_data):
+        from PIL import Image
+        if self.spread_mode != 'split':
+            return False
+        with Image.open(io.BytesIO(img_data)) as img:
+            return img.width >= SPREAD_MIN_ASPECT * img.height
+
+    # Function to find the two pages of a spread as boxes (left, top, right, bottom), in reading order
+    # The spread is split in the middle of its gutter: the run of columns near the middle that vary least from top to bottom
+    # (the white gap or the shadow of the binding), found on a copy averaged down to about CROP_SAMPLE_SIZE pixels.
+    # Of several such runs, the one nearest the middle of the spread is used. If no column stands out, e.g. when a picture crosses the middle, the spread is split in the middle.
+    def find_spread_pages(self, img_data):
+        import numpy as np
+        from PIL import Image
+        with Image.open(io.BytesIO(img_data)) as img:
+            width, height = img.size
+            if img.format == 'JPEG':
+                img.draft('L', (CROP_SAMPLE_SIZE, CROP_SAMPLE_SIZE))
+            gray = img.convert('L')
+        factor = max(1, max(gray.size) // CROP_SAMPLE_SIZE)
+        arr = np.asarray(gray.reduce(factor) if factor > 1 else gray, dtype=np.float32)
+        start = int(arr.shape[1] * (0.5 - SPREAD_GUTTER_BAND / 2))
+        end = max(start + 1, int(arr.shape[1] * (0.5 + SPREAD_GUTTER_BAND / 2)))
+        deviations = arr[:, start:end].std(axis=0)
+        median = np.median(deviations)
+        if deviations.min() <= SPREAD_GUTTER_RATIO * median:
+            in_gutter = np.concatenate(([False], deviations <= deviations.min() + SPREAD_GUTTER_TOLERANCE * median, [False]))
+            # Starts and ends (exclusive) of the runs of gutter columns
+            edges = np.flatnonzero(in_gutter[1:] != in_gutter[:-1]).reshape(-1, 2)
+            middles = start + edges.mean(axis=1)
+            middle = middles[np.argmin(np.abs(middles - arr.shape[1] / 2))]
+            gutter = round(middle * width / arr.shape[1])
+        else:
+            gutter = width // 2
+        left, right = (0, 0, gutter, height), (gutter, 0, width, height)
+        return [right, left] if self.direction == 'R2L' else [left, right]
+
+    # Function to split a spread into two pages and convert each of them with the conversion function of the spread
+    # Returns the list of converted pages
+    def convert_spread(self, convert, img_data, img_file_path):
+        return [convert(img_data, img_file_path, region)[0] for region in self.find_spread_pages(img_data)], img_file_path
+
+    # Function to open image data, cropped to its content if auto_crop is set, and reduced to the target size
+    # with the Lanczos filter if it is too large
+    # JPEG images are decoded at a reduced scale (draft mode) close to the target size, which is much faster.
+    # Cropped images are reduced from the full resolution, so that the content keeps as many pixels as possible.
+    # The reduced image keeps the page size of the original through its DPI, stored as 'reduced_dpi' in img.info.
+    # region is the box of a page of a spread, or None for the whole image
+    def open_image(self, img_data, region=None):
+        from PIL import Image
+        img = Image.open(io.BytesIO(img_data))
+        if region is not None:
+            img = img.crop(region)
+            img.info['region'] = region
+        box = self.get_crop_box(img)
+        if box is not None:
+            img = img.crop(box)
+            img.info['crop_box'] = box
+        size = self.get_reduced_size(img)
+        if size is None:
+            return img
+        dpi = self.get_dpi(img) * size[0] / img.width
+        if img.format == 'JPEG':
+            img.draft(img.mode, size)
+        # Palette images are resampled in full color, and get a palette again unless they have transparency
+        quantize = img.mode == 'P' and 'transparency' not in img.info
+        if img.mode == '1':
+            img = img.convert('L')
+        elif img.mode == 'P':
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        if quantize:
+            img = img.quantize(256)
+        img.info['reduced_dpi'] = (dpi, dpi)
+        return img
+
+    # Function to get the parameters to save an image, with the resolution of a reduced image
+    def get_save_params(self, img):
+        if 'reduced_dpi' in img.info:
+            return {'dpi': img.info['reduced_dpi']}
+        return {}
+
+    # Function to encode an image as JPEG with the encoder settings
+    def encode_jpeg(self, img, quality):
+        img_output = io.BytesIO()
+        params = self.get_save_params(img)
+        if self.jpeg_subsampling is not None:
+            params['subsampling'] = self.jpeg_subsampling
+        img.save(img_output, 'JPEG', quality=quality, progressive=self.jpeg_progressive, optimize=self.jpeg_optimize, **params)
+        return img_output.getvalue()
+
+    # Function to encode an image as JPEG at the highest quality, up to jpeg_quality, that fits in page_budget bytes
+    # The quality is found by a binary search; a page that does not fit at MIN_JPEG_QUALITY is kept at that quality
+    def encode_jpeg_in_budget(self, img, page_budget):
+        jpeg_data = self.encode_jpeg(img, self.jpeg_quality)
+        if page_budget is None or len(jpeg_data) <= page_budget:
+            return jpeg_data
+        low, high = MIN_JPEG_QUALITY, self.jpeg_quality - 1
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self.encode_jpeg(img, quality)
+            if len(candidate) <= page_budget:
+                best = candidate
+                low = quality + 1
+            else:
+                high = quality - 1
+        if best is not None:
+            return best
+        return jpeg_data if self.jpeg_quality <= MIN_JPEG_QUALITY else self.encode_jpeg(img, MIN_JPEG_QUALITY)
+
+    # Function to convert image data to JPEG format
+    # In the JPEG mode, pages without color are stored as grayscale JPEG and the pages are fitted in the page budget
+    def to_jpeg(self, img_data, img_file_path, region=None):
+        with self.open_image(img_data, region) as im:
+            # Outside the JPEG mode, JPEG images are only encoded again if they are cropped or reduced
+            if not self.convert_to_jpeg and not self.is_transformed(im):
+                return img_data, img_file_path
+            if self.convert_to_jpeg and self.jpeg_grayscale and not self.is_color(im):
+                im = im.convert('L')
+            elif im.mode != 'L':
+                im = im.convert('RGB')
+            if self.convert_to_jpeg:
+                # The budget of each image of the book is shared by the two pages of a split spread
+                page_budget = self.page_budget // 2 if region is not None and self.page_budget is not None else self.page_budget
+                return self.encode_jpeg_in_budget(im, page_budget), img_file_path
+            return self.encode_jpeg(im, self.jpeg_quality), img_file_path
     
     # Function to determine whether an image is a color image or not.
+    # A pixel is colored when its RGB channels differ by more than color_threshold (0 to 1),
+    # and the image is a color image when more than color_min_ratio of its pixels are colored.
     def is_color(self, img):
+        import numpy as np
+        from PIL import Image
         # Return False if the image is grayscale.
-        if img.mode == 'L':
+        if img.mode in ['1', 'L', 'LA']:
             return False
-        # Get the values of each channel in RGB.
-        img = img.convert('RGB')
-        r_arr = np.array(img)[:, :, 0]/ 255
-        g_arr = np.array(img)[:, :, 1]/ 255
-        b_arr = np.array(img)[:, :, 2]/ 255
-        # Calculate the difference between each RGB channel.
-        diff_rg = np.abs(r_arr - g_arr)
-        diff_gb = np.abs(g_arr - b_arr)
-        diff_rb = np.abs(r_arr - b_arr)
-
-        # Get the location of each pixel where the difference between the RGB channels exceeds the threshold.
-        threshold = 0.5
-        not_gray_indices = np.argwhere(
-            (diff_rg > threshold) | (diff_gb > threshold) | (diff_rb > threshold)
-        )
-        return not_gray_indices.shape[0] != 0
-    
+        # Sample large images at color_sample_size pixels on the long side.
+        if self.color_sample_size is not None and max(img.size) > self.color_sample_size:
+            scale = max(img.size) / self.color_sample_size
+            img = img.resize((max(1, int(img.width / scale)), max(1, int(img.height / scale))), Image.NEAREST)
+        # Get the values of all RGB channels in a single uint8 array.
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        arr = np.asarray(img)
+        limit = int(self.color_threshold * 255)
+        max_colored = int(self.color_min_ratio * arr.shape[0] * arr.shape[1])
+        num_colored = 0
+        # The difference between the largest and smallest channel is the largest difference between any two channels.
+        # The rows are checked in blocks to stop as soon as enough colored pixels are found.
+        for start in range(0, arr.shape[0], 128):
+            block = arr[start:start + 128]
+            r_arr, g_arr, b_arr = block[:, :, 0], block[:, :, 1], block[:, :, 2]
+            diff = np.maximum(np.maximum(r_arr, g_arr), b_arr) - np.minimum(np.minimum(r_arr, g_arr), b_arr)
+            num_colored += np.count_nonzero(diff > limit)
+            if num_colored > max_colored:
+                return True
+        return False
+
     # Function to convert PNG images to grayscale if the input image is not already grayscale.
-    def to_grayscale(self, img_file_path, tmp_dir):
-        img_output_path = os.path.join(tmp_dir, os.path.basename(img_file_path)[:-4] + '.png')
-        with Image.open(img_file_path) as img:
+    def to_grayscale(self, img_data, img_file_path, region=None):
+        img_output = io.BytesIO()
+        with self.open_image(img_data, region) as img:
             if not self.is_color(img): # If the PNG image is in black and white, perform grayscale conversion.
                 img = img.convert('L')
             else:
                 img = img.convert('RGB')
-            img.save(img_output_path, 'PNG')
-        return img_output_path, img_file_path
+            img.save(img_output, 'PNG', **self.get_save_params(img))
+        return img_output.getvalue(), img_file_path
     
+    # Function to determine whether a grayscale image is black and white.
+    # The image is bitonal when at most bitonal_max_gray_ratio of its pixels are mid-gray, e.g. the anti-aliased edges of line art.
+    def is_bitonal(self, gray):
+        histogram = gray.histogram()
+        num_gray = sum(histogram[BITONAL_MARGIN:256 - BITONAL_MARGIN])
+        return num_gray <= self.bitonal_max_gray_ratio * gray.width * gray.height
+
+    # Function to convert black-and-white pages to 1-bit images, and the other pages as in to_grayscale.
+    # 1-bit pages are stored as CCITT Group 4 TIFF in a single strip, which img2pdf embeds without decoding,
+    # or as 1-bit PNG when that is smaller (e.g. fine screentone).
+    # JPEG pages that are not bitonal are kept as they are, or encoded again as JPEG if they are reduced.
+    def to_bitonal(self, img_data, img_file_path, region=None):
+        is_jpeg = img_file_path.lower().endswith(('.jpg', '.jpeg'))
+        img_output = io.BytesIO()
+        with self.open_image(img_data, region) as img:
+            keep_jpeg = is_jpeg and not self.is_transformed(img)
+            save_params = self.get_save_params(img)
+            if self.is_color(img):
+                if keep_jpeg:
+                    return img_data, img_file_path
+                if is_jpeg:
+                    return self.encode_jpeg(img.convert('RGB'), self.jpeg_quality), img_file_path
+                img.convert('RGB').save(img_output, 'PNG', **save_params)
+                return img_output.getvalue(), img_file_path
+            gray = img.convert('L')
+            if not self.is_bitonal(gray):
+                if keep_jpeg:
+                    return img_data, img_file_path
+                if is_jpeg:
+                    return self.encode_jpeg(gray, self.jpeg_quality), img_file_path
+                gray.save(img_output, 'PNG', **save_params)
+                return img_output.getvalue(), img_file_path
+        table = [255 if value >= self.bitonal_threshold else 0 for value in range(256)]
+        bitonal = gray.point(table, '1')
+        # 278 is the RowsPerStrip tag
+        bitonal.save(img_output, 'TIFF', compression='group4', tiffinfo={278: bitonal.height}, **save_params)
+        png_output = io.BytesIO()
+        bitonal.save(png_output, 'PNG', **save_params)
+        if png_output.tell() < img_output.tell():
+            return png_output.getvalue(), img_file_path
+        return img_output.getvalue(), img_file_path
+
     # Function to remove alpha channel from PNG images if the input image contains an alpha channel.
-    def remove_alpha_channel(self, img_file_path, tmp_dir):
-        img_output_path = os.path.join(tmp_dir, os.path.basename(img_file_path)[:-4] + '.png')
-        with Image.open(img_file_path) as img:
+    def remove_alpha_channel(self, img_data, img_file_path, region=None):
+        img_output = io.BytesIO()
+        with self.open_image(img_data, region) as img:
             if img.mode in ['RGBA', 'LA'] or (img.mode == 'P' and 'transparency' in img.info):
                 img = img.convert('RGB')
-            img.save(img_output_path, 'PNG')
-        return img_output_path, img_file_path
+            img.save(img_output, 'PNG', **self.get_save_params(img))
+        return img_output.getvalue(), img_file_path
         
-    # Function to extract the contents of an EPUB file
-    def extract_epub_contents(self, epub):
-        contents = epub.namelist()
-        ncx_names = []
-        opf_names = []
-        for item in contents:
-            extension = item.split('.')[-1].lower()
-            if extension == 'ncx':
-                ncx_names.append(item)
-            if extension == 'opf':
-                opf_names.append(item)
-        flag = False
-        for ncx in ncx_names:
-            if 'standard' in ncx:
-                ncx_name = ncx
-                flag = True
-        if not flag:
-            ncx_name = ncx_names[0]
-        flag = False
-        for opf in opf_names:
-            if 'standard' in opf:
-                opf_name = opf
-                flag = True
-        if not flag:
-            opf_name = opf_names[0]
-        page_names = []
-        with epub.open(opf_name) as opf:
-            opf_content = opf.read()
-            opf_tree = etree.fromstring(opf_content)
-            namespace = {'dc': 'http://purl.org/dc/elements/1.1/', 'opf': 'http://www.idpf.org/2007/opf'}
-            manifest = opf_tree.find('opf:manifest', namespaces=namespace)
-            for item in manifest.findall('opf:item[@media-type="image/jpeg"]', namespaces=namespace):
-                page_names.append(os.path.join(os.path.dirname(opf_name), item.get('href').replace('/', os.sep)).replace(os.sep, '/'))
-            for item in manifest.findall('opf:item[@media-type="image/png"]', namespaces=namespace):
-                page_names.append(os.path.join(os.path.dirname(opf_name), item.get('href').replace('/', os.sep)).replace(os.sep, '/'))
-        page_items = []
-        for page_name in page_names:
-            page_items.append(epub.open(page_name))
-        return page_names, page_items, ncx_name, opf_name
-
-    # Function to extract the index of an EPUB file
-    def extract_epub_index(self, epub, page_names, ncx_name: str):
-        page_index = []
-        with epub.open(ncx_name) as ncx_file:
-            ncx_content = ncx_file.read()
-        ncx_tree = etree.fromstring(ncx_content)
-        namespace = {'ncx': 'http://www.daisy.org/z3986/2005/ncx/', 'html': 'http://www.w3.org/1999/xhtml', 'svg':'http://www.w3.org/2000/svg'}
-        navmap = ncx_tree.find('ncx:navMap', namespaces=namespace)
-        navpoints = navmap.findall('ncx:navPoint', namespaces=namespace)
-        ncx_path = os.path.dirname(ncx_name) + '/'
-        for navpoint in navpoints:
-            nav_label = navpoint.find('ncx:navLabel/ncx:text', namespaces=namespace).text.strip()
-            nav_text = navpoint.find('ncx:content', namespaces=namespace).get('src')
-            if nav_text.startswith(ncx_path):
-                nav_text = nav_text[len(ncx_path):]
-            else:
-                nav_text = os.path.join(ncx_path, nav_text)
-            if nav_text.endswith('.xhtml'):
-                with epub.open(nav_text) as xhtml_file:
-                    xhtml_content = xhtml_file.read()
-                xhtml_tree = etree.fromstring(xhtml_content)
-                img_tags = xhtml_tree.findall('.//svg:image', namespaces=namespace)
-                if len(img_tags) == 0:
-                    img_tags = img_tags = xhtml_tree.findall('.//svg:img', namespaces=namespace)
-                for img_tag in img_tags:
-                    img_link = img_tag.get('{http://www.w3.org/1999/xlink}href', img_tag.get('src'))
-                    image_href = os.path.abspath(os.path.join(os.path.dirname(nav_text), img_link))
-                    image_href = os.path.relpath(image_href, os.getcwd()).replace(os.sep, '/')
-                    index_number = page_names.index(image_href)
-                    page_index.append([nav_label, index_number])
-            else:
-                index_number = page_names.index(nav_text)
-                page_index.append([nav_label, index_number])
-        return page_index
-    
-    # Function to extract the metadata of an EPUB file
-    def extract_epub_metadata(self, epub, opf_name: str):
-        with epub.open(opf_name) as opf_file:
-            opf_content = opf_file.read()
-        opf_tree = etree.fromstring(opf_content)
-        namespace = {'dc': 'http://purl.org/dc/elements/1.1/', 'opf': 'http://www.idpf.org/2007/opf'}
-        metadata = opf_tree.find('opf:metadata', namespaces=namespace)    
-        epub_metadata = {}
-        for key in ['title', 'creator', 'publisher', 'date', 'language']:
-            values = metadata.xpath('./dc:' + key, namespaces=namespace)
-            if key == 'creator':
-                if values:
-                    epub_metadata[key] = [value.text for value in values]
+    # Function to determine from the image header, without decoding the pixels, whether a PNG image can be embedded as it is
+    # The image is transcoded only if it has transparency or a mode that the conversion would change
+    def can_pass_through(self, img_data):
+        from PIL import Image
+        if self.convert_to_jpeg or self.convert_to_bitonal:
+            return False
+        with Image.open(io.BytesIO(img_data)) as img:
+            if img.format != 'PNG' or getattr(img, 'n_frames', 1) != 1 or 'transparency' in img.info:
+                return False
+            if self.convert_to_grayscale:
+                return img.mode in ['1', 'L']
+            return img.mode in ['1', 'L', 'P', 'RGB']
+
+    # Function to submit the conversion of an image file to the executor
+    # The future gives ((image data, image file path), usage), where usage is the worker usage from run_measured or None if the page is not converted
+    def submit_page(self, executor, img_data, img_file_path):
+        # JPEG images are embedded as they are, except in the bitonal mode where black-and-white scans are converted
+        # In the JPEG mode with a target size, JPEG images larger than their share of the target size are encoded again
+        is_jpeg = img_file_path.lower().endswith(('.jpg', '.jpeg'))
+        over_budget = self.convert_to_jpeg and self.page_budget is not None and len(img_data) > self.page_budget
+        # Spreads to split are converted into two pages by one task of the pool. They are rare, and are not cached
+        # since the cache holds one image per page.
+        if self.is_spread(img_data):
+            self.page_counts['transcoded'] += 1
+            self.split_pages.append(img_file_path)
+            return executor.submit(run_measured, self.convert_spread, self.get_page_converter(is_jpeg), img_data, img_file_path)
+        # Cropped pages have to be decoded to find their margins, so no page is embedded as it is
+        if ((is_jpeg and not self.convert_to_bitonal and not over_budget) or self.can_pass_through(img_data)) \
+            and not self.needs_reduction(img_data) and not self.auto_crop:
+            self.page_counts['passthrough'] += 1
+            future = concurrent.futures.Future()
+            future.set_result(((img_data, img_file_path), None))
+            return future
+        # Use the image converted by a previous run if it is in the cache or in the checkpoint of an interrupted conversion
+        # The page budget and the crop box of the book depend on all the pages of the book, so they are part of the key but not of the fingerprint
+        page_stores = [store for store in [self.cache, self.checkpoint] if store is not None]
+        if page_stores:
+            cache_key = page_stores[0].key(img_data, self.get_transcode_options() + (self.page_budget, self.book_crop_box))
+            for store in page_stores:
+                cached_data = store.get(cache_key)
+                if cached_data is not None:
+                    self.page_counts['cached'] += 1
+                    future = concurrent.futures.Future()
+                    future.set_result(((cached_data, img_file_path), None))
+                    return future
+        self.page_counts['transcoded'] += 1
+        future = executor.submit(run_measured, self.get_page_converter(is_jpeg), img_data, img_file_path)
+        for store in page_stores:
+            future.add_done_callback(lambda f, store=store: f.exception() is None and store.put(cache_key, f.result()[0][0]))
+        return future
+
+    # Function to get the function that converts a page in the conversion mode
+    def get_page_converter(self, is_jpeg):
+        if self.convert_to_jpeg:
+            return self.to_jpeg
+        if self.convert_to_bitonal:
+            return self.to_bitonal
+        if is_jpeg:
+            # JPEG images are only converted to be split, cropped or reduced, and stay JPEG images
+            return self.to_jpeg
+        if self.convert_to_grayscale:
+            return self.to_grayscale
+        return self.remove_alpha_channel
+
+    # Function to get the options that determine the result of the image conversion (used as part of the cache key)
+    def get_transcode_options(self):
+        if self.convert_to_jpeg:
+            options = ('jpeg', self.jpeg_quality, self.jpeg_subsampling, self.jpeg_progressive, self.jpeg_optimize, self.jpeg_grayscale, self.target_file_size)
+            if self.jpeg_grayscale:
+                options += (self.color_threshold, self.color_min_ratio, self.color_sample_size)
+        elif self.convert_to_bitonal:
+            options = ('bitonal', self.color_threshold, self.color_min_ratio, self.color_sample_size, self.bitonal_max_gray_ratio, self.bitonal_threshold)
+        elif self.convert_to_grayscale:
+            options = ('grayscale', self.color_threshold, self.color_min_ratio, self.color_sample_size)
+        else:
+            options = ('remove_alpha_channel',)
+        if self.is_reducing():
+            options += ('reduce', self.target_width, self.target_height, self.max_dpi)
+        if self.auto_crop:
+            options += ('crop', self.crop_tolerance, self.crop_uniform)
+        if self.spread_mode != 'keep':
+            options += ('spreads', self.spread_mode, self.direction)
+        if (self.is_reducing() or self.auto_crop or self.spread_mode != 'keep') and not self.convert_to_jpeg:
+            options += (self.jpeg_quality, self.jpeg_subsampling, self.jpeg_progressive, self.jpeg_optimize)
+        return options
+
+    # Function to create the pool that converts the images
+    # The 'auto' type uses processes when many pages need the CPU-heavy conversions to escape the GIL, and threads otherwise
+    def create_executor(self, img_files):
+        executor_type = self.executor_type
+        if executor_type == 'auto':
+            transforms_all = self.convert_to_bitonal or self.is_reducing() or self.auto_crop
+            num_converted = sum(1 for img_file_path in img_files if transforms_all or not img_file_path.lower().endswith(('.jpg', '.jpeg')))
+            if (self.convert_to_jpeg or self.convert_to_grayscale or transforms_all) and num_converted >= 16 and (os.cpu_count() or 1) > 1:
+                executor_type = 'process'
             else:
-                if values:
-                    epub_metadata[key] = values[0].text
+                executor_type = 'thread'
+        if executor_type == 'process':
+            max_workers = self.max_workers or os.cpu_count() or 1
+            return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers), max_workers
+        max_workers = self.max_workers or min(32, (os.cpu_count() or 1) + 4)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers), max_workers
+
+    # Function to read the data of an image file from the opened directory or archive file
+    def read_page(self, archive, img_file_path):
+        with self.metrics.stage('extract'):
+            img_data = archive.read(img_file_path)
+        self.metrics.add('extract', bytes_out=len(img_data))
+        self.metrics.add('transcode', bytes_in=len(img_data))
+        return img_data
+
+    # Function to iterate over the page images, recording the time spent reading and converting them
+    # The progress is reported and the cancellation is checked after each page
+    def timed_page_items(self, page_items, num_pages):
+        page_items = iter(page_items)
+        num_done = 0
+        while True:
+            self.check_canceled()
+            with self.metrics.stage('transcode'):
+                img_data = next(page_items, None)
+            if img_data is None:
+                return
+            self.metrics.add('transcode', bytes_out=len(img_data), pages=1)
+            num_done += 1
+            # Each split spread adds a page to the num_pages images of the book; the spreads are counted as they are read,
+            # which is before their pages are yielded
+            if self.progress_callback is not None:
+                self.progress_callback(num_done, num_pages + len(self.split_pages))
+            yield img_data
+
+    # Function to yield the converted image data in page order
+    # Each page keeps the index assigned when the image files were found, and the results are placed into
+    # a slot array as the futures complete. Only a limited number of pages are read and converted ahead,
+    # so memory use does not grow with the page count.
+    def iter_page_items(self, archive, img_files, executor, window):
+        slots = [None] * len(img_files)
+        pending = {}
+        num_submitted = 0
+        next_index = 0
+        try:
+            while next_index < len(img_files):
+                if slots[next_index] is not None:
+                    # A split spread gives a list of two pages
+                    if isinstance(slots[next_index], list):
+                        yield from slots[next_index]
+                    else:
+                        yield slots[next_index]
+                    slots[next_index] = None
+                    next_index += 1
+                elif num_submitted < len(img_files) and num_submitted - next_index < window:
+                    img_file_path = img_files[num_submitted]
+                    pending[self.submit_page(executor, self.read_page(archive, img_file_path), img_file_path)] = num_submitted
+                    num_submitted += 1
                 else:
-                    epub_metadata[key] = None
-        return epub_metadata
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        (img_data, _), usage = future.result()
+                        slots[pending.pop(future)] = img_data
+                        self.metrics.add_usage('transcode', usage)
+        finally:
+            # Drop the pages that have not started yet if the conversion stops early
+            for future in pending:
+                future.cancel()
+
+    # Function to write a chunk of page images to a PDF file in a temporary directory
+    def write_pdf_chunk(self, chunk, tmp_dir, chunk_number):
+        import img2pdf
+        chunk_path = os.path.join(tmp_dir, f'chunk_{chunk_number:05d}.pdf')
+        with open(chunk_path, 'wb') as f:
+            img2pdf.convert(chunk, outputstream=f)
+        self.metrics.add('img2pdf', bytes_in=sum(len(img_data) for img_data in chunk), bytes_out=os.path.getsize(chunk_path), pages=len(chunk))
+        return chunk_path
+
+    # Function to convert page images to PDF data
+    # If a memory limit is set, the pages are written as they are produced to PDF files of at most memory_limit bytes of images
+    def assemble_pdf_chunks(self, page_items, tmp_dir):
+        import img2pdf
+        if self.memory_limit is None:
+            page_items = list(page_items)
+            pdf_data = img2pdf.convert(page_items)
+            self.metrics.add('img2pdf', bytes_in=sum(len(img_data) for img_data in page_items), bytes_out=len(pdf_data), pages=len(page_items))
+            return [io.BytesIO(pdf_data)]
+        pdf_chunks = []
+        chunk = []
+        chunk_size = 0
+        for img_data in page_items:
+            if chunk and chunk_size + len(img_data) > self.memory_limit:
+                pdf_chunks.append(self.write_pdf_chunk(chunk, tmp_dir, len(pdf_chunks)))
+                chunk = []
+                chunk_size = 0
+            chunk.append(img_data)
+            chunk_size += len(img_data)
+        if chunk or not pdf_chunks:
+            pdf_chunks.append(self.write_pdf_chunk(chunk, tmp_dir, len(pdf_chunks)))
+        return pdf_chunks
+
+    # Function to get a digest of an image XObject from its encoded data and its dictionary
+    # The soft mask of an image with transparency is compared by its own digest
+    def get_image_digest(self, image):
+        import pikepdf
+        digest = hashlib.sha256(image.read_raw_bytes())
+        for key in sorted(image.keys()):
+            if key not in ['/Length', '/SMask']:
+                value = image[key]
+                digest.update(key.encode('utf-8') + (value.unparse() if isinstance(value, pikepdf.Object) else repr(value).encode('utf-8')))
+        if '/SMask' in image:
+            digest.update(self.get_image_digest(image.SMask).encode('utf-8'))
+        return digest.hexdigest()
+
+    # Function to make the pages with identical images (e.g. repeated credits, blank or title pages) share one image XObject
+    # Pages converted from identical images are also identical, since the conversion is deterministic.
+    # The images that are no longer used are not written when the PDF is saved.
+    def dedup_images(self, pdf):
+        images = {}
+        for page in pdf.pages:
+            if '/Resources' not in page or '/XObject' not in page.Resources:
+                continue
+            xobjects = page.Resources.XObject
+            for name in list(xobjects.keys()):
+                image = xobjects[name]
+                if image.get('/Subtype') != '/Image':
+                    continue
+                digest = self.get_image_digest(image)
+                if digest not in images:
+                    images[digest] = image
+                elif images[digest].objgen != image.objgen:
+                    xobjects[name] = images[digest]
+                    self.metrics.add('dedup', bytes_in=int(image.get('/Length', 0)), pages=1)
+
+    # Function to compute a fingerprint of the input, the options and the converter version
+    # Input files are identified by their size and modification time, so archives are not opened
+    def get_fingerprint(self):
+        if os.path.isdir(self.input_path):
+            source = []
+            for root, _, files in os.walk(self.input_path):
+                for file in files:
+                    if self.is_image_file(file):
+                        stat = os.stat(os.path.join(root, file))
+                        source.append((os.path.relpath(os.path.join(root, file), self.input_path), stat.st_size, stat.st_mtime_ns))
+            source.sort()
+        else:
+            stat = os.stat(self.input_path)
+            source = (stat.st_size, stat.st_mtime_ns)
+        metadata = tuple(sorted(self.metadata.items())) if self.metadata is not None else None
+        # Deduplication changes the PDF file but not the images, so it is not part of the transcode options
+        options = (self.pagelayout, self.pagemode, self.direction, self.get_transcode_options(), metadata, self.dedup)
+        fingerprint = (__version__, os.path.abspath(self.input_path), source, options)
+        return hashlib.sha256(repr(fingerprint).encode('utf-8')).hexdigest()
+
+    # Function to get the path of the output PDF file
+    # If the output path is not specified, it is generated from the input file or directory name
+    def get_output_path(self):
+        if self.output_path is not None:
+            return self.output_path
+        if self.output_stream is not None:
+            return None
+        if self.input_stream is not None:
+            raise ValueError('An output path or stream is required to convert an input stream.')
+        if os.path.isdir(self.input_path):
+            pdf_filename = os.path.basename(self.input_path) + '.pdf'
+            return os.path.join(self.input_path, pdf_filename).replace(os.sep, '/')
+        pdf_filename, _ = os.path.splitext(self.input_path)
+        return f"{pdf_filename}.pdf"
 
     # Function to convert input files to a PDF file
     def convert(self):
-        if self.is_epub_file(self.input_path):
-            with zipfile.ZipFile(self.input_path) as epub:
-                page_names = self.extract_epub_contents(epub)[0]
-                page_items = self.extract_epub_contents(epub)[1]
-                ncx_name = self.extract_epub_contents(epub)[2]
-                opf_name = self.extract_epub_contents(epub)[3]
-                page_index = self.extract_epub_index(epub, page_names, ncx_name)
-                epub_metadata = self.extract_epub_metadata(epub, opf_name)
-        else:
-            page_items = []
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                img_files = self.find_image_files(self.input_path, tmp_dir)
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    futures = []
-                    for img_file_path in img_files:
-                        if img_file_path.lower().endswith(('.jpg', '.jpeg')):
-                            with open(img_file_path, 'rb') as f:
-                                page_items.append((f.read(), img_file_path))
-                        else:
-                            if self.convert_to_jpeg:
-                                future = executor.submit(self.to_jpeg, img_file_path, tmp_dir)
-                                futures.append(future)
-                            elif self.convert_to_grayscale:
-                                future = executor.submit(self.to_grayscale, img_file_path, tmp_dir)
-                                futures.append(future)
-                            else:
-                                future = executor.submit(self.remove_alpha_channel, img_file_path, tmp_dir)
-                                futures.append(future)
-                    for future in concurrent.futures.as_completed(futures):
-                        img_output_path, img_file_path = future.result()
-                        with open(img_output_path, 'rb') as f:
-                            page_items.append((f.read(), img_file_path))
-            # Reorder images so that the order of images is the same as the list of img_files
-            page_items.sort(key=lambda x: img_files.index(x[1]))
-            page_items = [data[0] for data in page_items]
-        
-        pdf_obj = io.BytesIO(img2pdf.convert(page_items))
-        
-        with pikepdf.Pdf.open(pdf_obj) as pdf:
-            if self.is_epub_file(self.input_path):
+        import pikepdf
+        self.metrics = ConversionMetrics()
+        self.page_counts = {'passthrough': 0, 'cached': 0, 'transcoded': 0}
+        self.split_pages = []
+        # The checkpoint has no size limit; it is removed once the PDF file is saved
+        self.checkpoint = PageCache(self.get_checkpoint_dir(), None, durable=True) if self.resume and self.output_stream is None else None
+        with contextlib.ExitStack() as stack:
+            tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            if self.input_stream is not None:
+                source, input_format = self.input_stream, self.input_format
+                source.seek(0, os.SEEK_END)
+                self.metrics.add('extract', bytes_in=source.tell())
+                source.seek(0)
+                is_epub = input_format == '.epub'
+            else:
+                source, input_format = self.input_path, None
+                if not os.path.isdir(self.input_path):
+                    self.metrics.add('extract', bytes_in=os.path.getsize(self.input_path))
+                is_epub = self.is_epub_file(self.input_path)
+            # The pages of an EPUB file are read from the package like the members of an archive, in reading order
+            with self.metrics.stage('extract'):
+                if is_epub:
+                    archive = epub = stack.enter_context(EpubPackage(source))
+                    img_files = epub.page_names
+                else:
+                    archive = stack.enter_context(self.open_archive(source, tmp_dir, input_format))
+                    img_files = self.find_image_files(archive)
+            num_pages = len(img_files)
+            self.metrics.add('extract', pages=num_pages)
+            self.page_budget = None
+            if self.convert_to_jpeg and self.target_file_size is not None:
+                self.page_budget = self.target_file_size // max(num_pages, 1)
+            if self.executor is not None:
+                executor, max_workers = self.executor, self.max_workers or 1
+            else:
+                executor, max_workers = self.create_executor(img_files)
+                stack.enter_context(executor)
+            # The crop box of the book is found in a first pass over the pages
+            self.book_crop_box = None
+            if self.auto_crop and self.crop_uniform:
+                with self.metrics.stage('crop'):
+                    self.book_crop_box = self.find_book_crop_box(archive, img_files, executor, max_workers * 2)
+                self.metrics.add('crop', pages=num_pages)
+            page_items = self.iter_page_items(archive, img_files, executor, max_workers * 2)
+            with self.metrics.stage('img2pdf'):
+                pdf_chunks = self.assemble_pdf_chunks(self.timed_page_items(page_items, num_pages), tmp_dir)
+            with self.metrics.stage('pdf_open'):
+                pdf = stack.enter_context(pikepdf.Pdf.open(pdf_chunks[0]))
+                for pdf_chunk in pdf_chunks[1:]:
+                    pdf.pages.extend(stack.enter_context(pikepdf.Pdf.open(pdf_chunk)).pages)
+            self.metrics.add('pdf_open', pages=len(pdf.pages))
+            if self.dedup:
+                with self.metrics.stage('dedup'):
+                    self.dedup_images(pdf)
+            if is_epub:
+                with pdf.open_metadata(set_pikepdf_as_editor=False) as pdf_metadata:
+                    pdf_metadata['dc:title'] = epub.metadata['title'] if epub.metadata['title'] else ''
+                    pdf_metadata['dc:creator'] = epub.metadata['creator'] if epub.metadata['creator'] else ''
+                    pdf_metadata['dc:publisher'] = epub.metadata['publisher'] if epub.metadata['publisher'] else ''
+                    pdf_metadata['xmp:CreateDate'] = epub.metadata['date'] if epub.metadata['date'] else ''
+                    pdf_metadata['pdf:Language'] = epub.metadata['language'] if epub.metadata['language'] else ''
+                    pdf_metadata['pdf:Producer'] = ''
+            if self.metadata is not None:
                 with pdf.open_metadata(set_pikepdf_as_editor=False) as pdf_metadata:
-                    pdf_metadata['dc:title'] = epub_metadata['title'] if epub_metadata['title'] else ''
-                    pdf_metadata['dc:creator'] = epub_metadata['creator'] if epub_metadata['creator'] else ''
-                    pdf_metadata['dc:publisher'] = epub_metadata['publisher'] if epub_metadata['publisher'] else ''
-                    pdf_metadata['xmp:CreateDate'] = epub_metadata['date'] if epub_metadata['date'] else ''
-                    pdf_metadata['pdf:Language'] = epub_metadata['language'] if epub_metadata['language'] else ''
+                    pdf_metadata['dc:title'] = self.metadata['title'] or ''
+                    pdf_metadata['dc:creator'] = self.metadata['creators'] or ['']
+                    pdf_metadata['dc:publisher'] = self.metadata['publisher'] or ''
+                    if self.metadata['create_date']:
+                        pdf_metadata['xmp:CreateDate'] = self.metadata['create_date']
+                    if self.metadata['modify_date']:
+                        pdf_metadata['xmp:ModifyDate'] = self.metadata['modify_date']
                     pdf_metadata['pdf:Producer'] = ''
+            if is_epub:
+                # Each split spread before a page of the table of contents moves it by one page
+                split_numbers = [epub.page_numbers[img_file_path] for img_file_path in self.split_pages]
                 pdf_index = []
-                for index in page_index:
-                    pdf_index.append(pikepdf.OutlineItem(index[0], index[1]))
+                for index in epub.page_index:
+                    pdf_index.append(pikepdf.OutlineItem(index[0], index[1] + sum(1 for number in split_numbers if number < index[1])))
                 with pdf.open_outline() as outline:
                     outline.root.extend(pdf_index)
             if self.pagelayout is not None:
@@ -320,30 +1507,90 @@ class MangaPdfConverter():
                 if not hasattr(pdf.Root.ViewerPreferences, 'Direction') \
                     or pdf.Root.ViewerPreferences.Direction != '/' + self.direction:
                         pdf.Root.ViewerPreferences.Direction = pikepdf.Name('/' + self.direction)
-            if self.output_path is None:
-                if os.path.isdir(self.input_path):
-                    pdf_filename = os.path.basename(self.input_path) + '.pdf'
-                    output_path = os.path.join(self.input_path, pdf_filename).replace(os.sep, '/')
-                else:
-                    pdf_filename, _ = os.path.splitext(self.input_path)
-                    output_path = f"{pdf_filename}.pdf"
+            self.check_canceled()
+            self.num_pages = len(pdf.pages)
+            if self.output_stream is not None:
+                start = self.output_stream.tell() if self.output_stream.seekable() else 0
+                with self.metrics.stage('save'):
+                    pdf.save(self.output_stream, linearize=True)
+                bytes_out = self.output_stream.tell() - start if self.output_stream.seekable() else 0
+                self.metrics.add('save', bytes_out=bytes_out, pages=self.num_pages)
             else:
-                output_path = self.output_path
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            pdf.save(output_path, linearize=True)
+                # The previous PDF file is only replaced once the new one is complete
+                output_path = self.get_output_path()
+                with self.metrics.stage('save'):
+                    write_atomically(output_path, lambda f: pdf.save(f, linearize=True))
+                self.metrics.add('save', bytes_out=os.path.getsize(output_path), pages=self.num_pages)
+        if self.checkpoint is not None:
+            shutil.rmtree(self.checkpoint.cache_dir, ignore_errors=True)
+            self.checkpoint = None
+        if self.cache is not None:
+            self.cache.evict()
+        if self.metrics_callback is not None:
+            self.metrics_callback(self.get_metrics())
         return None
 
+    # Function to get the metrics of the last conversion as a dict
+    def get_metrics(self):
+        metrics = {
+            'input': self.input_path,
+            'output': self.get_output_path(),
+            'pages': self.num_pages,
+            'page_counts': dict(self.page_counts),
+        }
+        metrics.update(self.metrics.to_dict())
+        return metrics
+
 class HelpFormatter(argparse.HelpFormatter):
     def __init__(self, prog, indent_increment=2, max_help_position=6, width=None):
         super().__init__(prog, indent_increment, max_help_position, width)
     def _split_lines(self, text, _):
         return text.splitlines()
 
+# Function to determine whether the given path is a directory or a file format supported by the command line
+def is_supported_input(path):
+    if os.path.isdir(path):
+        return True
+    ext = os.path.splitext(path)[1].lower()
+    return ext in ['.zip', '.cbz', '.rar', '.cbr', '.7z', '.cb7', '.tar', '.cbt', '.epub']
+
+# Function to create a converter with the options given on the command line
+def create_converter(args, input_path, output_path):
+    converter = MangaPdfConverter(input_path, output_path, args.pagelayout, args.pagemode, args.direction)
+    if args.jpeg:
+        converter.set_convert_to_jpeg(True)
+    elif args.bitonal:
+        converter.set_convert_to_bitonal(True)
+    elif args.grayscale:
+        converter.set_convert_to_grayscale(True)
+    if args.memory_limit is not None:
+        converter.set_memory_limit(args.memory_limit * 1024 * 1024)
+    converter.set_executor_type(args.executor)
+    converter.set_max_workers(args.max_workers)
+    converter.set_color_detection(args.color_threshold, args.color_min_ratio, args.color_sample_size)
+    converter.set_bitonal_detection(args.bitonal_ratio)
+    target_width, target_height = DEVICE_PRESETS[args.device] if args.device is not None else (None, None)
+    converter.set_target_size(args.target_width or target_width, args.target_height or target_height)
+    converter.set_max_dpi(args.max_dpi)
+    converter.set_dedup(args.dedup)
+    converter.set_auto_crop(args.crop, args.crop_tolerance, args.crop_uniform)
+    converter.set_spread_mode(args.spreads)
+    converter.set_jpeg_options(args.jpeg_quality, args.jpeg_subsampling, args.jpeg_progressive, args.jpeg_optimize, args.jpeg_grayscale)
+    if args.target_file_size is not None:
+        converter.set_target_file_size(int(args.target_file_size * 1024 * 1024))
+    if args.cache_dir is not None:
+        converter.set_cache(args.cache_dir, args.cache_size * 1024 * 1024)
+    converter.set_resume(args.resume)
+    if args.metrics == 'json':
+        converter.set_metrics_callback(lambda metrics: print(json.dumps(metrics), flush=True))
+    return converter
+
 def main():
     parser = argparse.ArgumentParser(description='This program converts manga/comic files(zip, epub, etc.) or directory containing image files (jpg, png, etc.) to PDF', formatter_class=HelpFormatter)
-    parser.add_argument('input_path', nargs='?', metavar='input_path', type=str,
-                        help='input file path or directory path')
+    parser.add_argument('input_paths', nargs='*', metavar='input_path', type=str,
+                        help='''\
+input file path or directory path.
+Several paths or glob patterns (e.g. "library/*.cbz") convert the books in batch mode.''')
     parser.add_argument('-o', '--output', dest='output_path', type=str, default=None,
                         help='''\
 path to the output PDF file. 
@@ -372,6 +1619,96 @@ L2R -> Left Binding
 (default)R2L -> Right Binding''')
     parser.add_argument('-j', '--jpeg', action='store_true', help='Convert images to JPEG')
     parser.add_argument('-g', '--grayscale', action='store_true', help='Convert images to grayscale')
+    parser.add_argument('-b', '--bitonal', action='store_true',
+                        help='''\
+Convert black-and-white pages to 1-bit images (CCITT Group 4), and the other pages to grayscale
+(the color pages are kept in color as in --grayscale)''')
+    parser.add_argument('--jpeg-quality', dest='jpeg_quality', type=int, default=75, metavar='Q',
+                        help='quality of the JPEG images (1 to 95, default: 75)')
+    parser.add_argument('--jpeg-subsampling', dest='jpeg_subsampling', type=str, default=None, choices=['4:4:4', '4:2:2', '4:2:0'],
+                        help='chroma subsampling of the JPEG images (default: 4:2:0, or 4:4:4 above quality 90)')
+    parser.add_argument('--jpeg-progressive', dest='jpeg_progressive', action='store_true', help='write progressive JPEG images')
+    parser.add_argument('--jpeg-optimize', dest='jpeg_optimize', action='store_true',
+                        help='optimize the Huffman tables of the JPEG images (smaller, slower)')
+    parser.add_argument('--no-jpeg-grayscale', dest='jpeg_grayscale', action='store_false',
+                        help='keep the pages without color as color JPEG in --jpeg mode instead of grayscale JPEG')
+    parser.add_argument('--target-file-size', dest='target_file_size', type=float, default=None, metavar='MB',
+                        help='''\
+lower the JPEG quality of the pages in --jpeg mode so that the book fits in about MB megabytes.
+Each page gets an equal share, and JPEG pages larger than their share are encoded again.''')
+    parser.add_argument('--memory-limit', dest='memory_limit', type=int, default=None, metavar='MB',
+                        help='''\
+Write the PDF incrementally, holding at most about MB megabytes of page images in memory.
+Useful for very large books. If not specified, all pages are assembled in memory.''')
+    parser.add_argument('--executor', type=str, default='thread', choices=['thread', 'process', 'auto'],
+                        help='''\
+(default)thread -> Convert images in a thread pool
+process -> Convert images in a process pool (uses all CPU cores for --jpeg and --grayscale)
+auto -> Choose the pool from the conversion mode and the number of pages''')
+    parser.add_argument('--workers', dest='max_workers', type=int, default=None, metavar='N',
+                        help='number of image conversion workers')
+    parser.add_argument('--color-threshold', dest='color_threshold', type=float, default=0.5, metavar='T',
+                        help='''\
+difference between RGB channels (0 to 1) above which a pixel counts as colored in --grayscale mode
+(default: 0.5)''')
+    parser.add_argument('--color-ratio', dest='color_min_ratio', type=float, default=0.0, metavar='R',
+                        help='''\
+ratio of colored pixels (0 to 1) above which a page is kept in color in --grayscale mode
+(default: 0.0, any colored pixel)''')
+    parser.add_argument('--color-sample-size', dest='color_sample_size', type=int, default=None, metavar='PX',
+                        help='detect colors on images reduced to PX pixels on the long side (faster for large scans)')
+    parser.add_argument('--bitonal-ratio', dest='bitonal_ratio', type=float, default=0.05, metavar='R',
+                        help='''\
+ratio of mid-gray pixels (0 to 1) up to which a page counts as black and white in --bitonal mode
+(default: 0.05)''')
+    parser.add_argument('--target-height', dest='target_height', type=int, default=None, metavar='PX',
+                        help='reduce the pages taller than PX pixels (pages that are small enough are kept as they are)')
+    parser.add_argument('--target-width', dest='target_width', type=int, default=None, metavar='PX',
+                        help='reduce the pages wider than PX pixels')
+    parser.add_argument('--device', type=str, default=None, choices=list(DEVICE_PRESETS),
+                        help='reduce the pages to fit the screen of a reading device (--target-width/--target-height override it)')
+    parser.add_argument('--max-dpi', dest='max_dpi', type=float, default=None, metavar='DPI',
+                        help='reduce the pages whose resolution is above DPI (images without a resolution count as 96 DPI)')
+    parser.add_argument('--crop', action='store_true', help='crop the white or black margins of the pages')
+    parser.add_argument('--crop-tolerance', dest='crop_tolerance', type=float, default=0.1, metavar='T',
+                        help='''\
+difference from the margin color (0 to 1) above which a pixel counts as content in --crop mode
+(default: 0.1)''')
+    parser.add_argument('--crop-uniform', dest='crop_uniform', action='store_true',
+                        help='crop all pages by the same box, which contains the content of every page (consistent page size)')
+    parser.add_argument('--spreads', type=str, default='keep', choices=['keep', 'split'],
+                        help='''\
+(default)keep -> Keep two-page spreads (pages wider than tall) as one page
+split -> Split two-page spreads into two pages at the gutter, in the reading order of --direction''')
+    parser.add_argument('--no-dedup', dest='dedup', action='store_false',
+                        help='store identical pages separately instead of sharing one image (faster for books without repeated pages)')
+    parser.add_argument('--cache-dir', dest='cache_dir', type=str, default=None, metavar='DIR',
+                        help='directory to cache converted images, so that later runs skip converting the same images again')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=1024, metavar='MB',
+                        help='maximum size of the cache; the least recently used images are removed (default: 1024)')
+    parser.add_argument('--resume', action='store_true',
+                        help='''\
+keep the converted images in a checkpoint directory next to the output PDF until it is saved,
+so that an interrupted conversion started again skips the pages already converted''')
+    parser.add_argument('--incremental', dest='index_path', nargs='?', const='.manga2pdf-index.json', default=None, metavar='INDEX',
+                        help='''\
+skip books whose PDF is up to date with the input and the options.
+The fingerprints of converted books are recorded in the INDEX file (default: .manga2pdf-index.json).''')
+    parser.add_argument('--metrics', type=str, default=None, choices=['json'],
+                        help='print the time, CPU time, bytes, pages and peak memory of each conversion stage as a JSON line')
+    parser.add_argument('--manifest', type=str, default=None, metavar='FILE',
+                        help='text file listing input paths or glob patterns, one per line (batch mode)')
+    parser.add_argument('--jobs', type=int, default=2, metavar='N',
+                        help='number of books converted at the same time in batch mode (default: 2)')
+    parser.add_argument('--watch', type=str, default=None, metavar='DIR',
+                        help='''\
+watch DIR and convert the books dropped in it until interrupted (Ctrl+C).
+Books are converted once they stop changing; the PDF is written next to each book.
+Converted books are recorded in the --incremental INDEX (default: DIR/.manga2pdf-index.json).''')
+    parser.add_argument('--watch-interval', dest='watch_interval', type=float, default=2.0, metavar='SECONDS',
+                        help='seconds between two scans of the watched directory (default: 2)')
+    parser.add_argument('--stable-time', dest='stable_time', type=float, default=5.0, metavar='SECONDS',
+                        help='seconds a book must stay unchanged before it is converted in --watch mode (default: 5)')
     parser.add_argument('-gui', action='store_true', help='Launch GUI')
     parser.add_argument('--version', action='version', version=f'manga2pdf {__version__}',
                         help='show version information and exit')
@@ -381,15 +1718,10 @@ L2R -> Left Binding
         from . import manga2pdf_gui
         manga2pdf_gui.launch_gui()
     else:
-        if args.input_path is None:
+        if not args.input_paths and args.manifest is None and args.watch is None:
             parser.print_usage()
             parser.print_help()
             sys.exit(1)
-        if not os.path.isdir(args.input_path):
-            ext = os.path.splitext(args.input_path)[1].lower()
-            if not ext in ['.zip', '.cbz', '.rar', '.cbr', '.7z', '.cb7', '.tar', '.cbt', '.epub']:
-                print('Error: The input file format is not supported. The currently supported formats are: .zip, .cbz, .rar, .cbr, .7z, .cb7, .tar, .cbt, and .epub.')
-                sys.exit(1)
         if args.output_path is not None:
             if not args.output_path.endswith('.pdf'):
                 print('Error: The output file must be an PDF file.')
@@ -397,13 +1729,100 @@ L2R -> Left Binding
         if args.grayscale and args.jpeg:
             print('Error: Cannot specify both --grayscale and --jpeg options.')
             sys.exit(1)
-        
-        converter = MangaPdfConverter(args.input_path, args.output_path, args.pagelayout, args.pagemode, args.direction)
-        if args.jpeg:
-            converter.set_convert_to_jpeg(True)
-        elif args.grayscale:
-            converter.set_convert_to_grayscale(True)
-        converter.convert()
+        if args.bitonal and args.jpeg:
+            print('Error: Cannot specify both --bitonal and --jpeg options.')
+            sys.exit(1)
+        if not 1 <= args.jpeg_quality <= 95:
+            print('Error: The JPEG quality must be between 1 and 95.')
+            sys.exit(1)
+        if args.target_file_size is not None and (args.target_file_size <= 0 or not args.jpeg):
+            print('Error: The target file size must be a positive number of megabytes, and requires the --jpeg option.')
+            sys.exit(1)
+        if not 0 <= args.crop_tolerance < 1:
+            print('Error: The crop tolerance must be between 0 and 1.')
+            sys.exit(1)
+        if args.crop_uniform and not args.crop:
+            print('Error: The --crop-uniform option requires the --crop option.')
+            sys.exit(1)
+        if not 0 <= args.bitonal_ratio <= 1:
+            print('Error: The bitonal ratio must be between 0 and 1.')
+            sys.exit(1)
+        if any(value is not None and value <= 0 for value in [args.target_width, args.target_height, args.max_dpi]):
+            print('Error: The target size and the maximum DPI must be positive numbers.')
+            sys.exit(1)
+        if args.memory_limit is not None and args.memory_limit <= 0:
+            print('Error: The memory limit must be a positive number of megabytes.')
+            sys.exit(1)
+        if args.max_workers is not None and args.max_workers <= 0:
+            print('Error: The number of workers must be a positive number.')
+            sys.exit(1)
+        if not 0 <= args.color_threshold <= 1 or not 0 <= args.color_min_ratio <= 1:
+            print('Error: The color threshold and ratio must be between 0 and 1.')
+            sys.exit(1)
+        if args.color_sample_size is not None and args.color_sample_size <= 0:
+            print('Error: The color sample size must be a positive number of pixels.')
+            sys.exit(1)
+        if args.cache_size <= 0:
+            print('Error: The cache size must be a positive number of megabytes.')
+            sys.exit(1)
+        if args.jobs <= 0:
+            print('Error: The number of jobs must be a positive number.')
+            sys.exit(1)
+        if args.watch_interval <= 0 or args.stable_time < 0:
+            print('Error: The watch interval must be a positive number of seconds and the stable time must not be negative.')
+            sys.exit(1)
+        # The images are converted in every book when a conversion mode or a reduction is set
+        cpu_heavy = args.jpeg or args.grayscale or args.bitonal or args.crop \
+            or any(value is not None for value in [args.device, args.target_width, args.target_height, args.max_dpi])
+
+        # Convert the books dropped in a directory until interrupted
+        if args.watch is not None:
+            if args.input_paths or args.manifest is not None or args.output_path is not None:
+                print('Error: The --watch option cannot be used with input paths, --manifest or --output.')
+                sys.exit(1)
+            if not os.path.isdir(args.watch):
+                print(f'Error: {args.watch} is not a directory.')
+                sys.exit(1)
+            from . import manga2pdf_watch
+            index = ConversionIndex(args.index_path or os.path.join(args.watch, '.manga2pdf-index.json'))
+            manga2pdf_watch.watch(args.watch, lambda input_path: create_converter(args, input_path, None), is_supported_input, index,
+                                  args.executor, args.max_workers, args.jobs, cpu_heavy, args.watch_interval, args.stable_time)
+            sys.exit(0)
+
+        # Convert several books in batch mode
+        if len(args.input_paths) > 1 or args.manifest is not None or any(glob.has_magic(path) for path in args.input_paths):
+            if args.output_path is not None:
+                print('Error: The --output option cannot be used with several input paths.')
+                sys.exit(1)
+            from . import manga2pdf_batch
+            input_paths = manga2pdf_batch.collect_inputs(args.input_paths, args.manifest, is_supported_input)
+            if not input_paths:
+                print('Error: No input files were found.')
+                sys.exit(1)
+            for input_path in input_paths:
+                if not is_supported_input(input_path):
+                    print(f'Error: The input file format of {input_path} is not supported. The currently supported formats are: .zip, .cbz, .rar, .cbr, .7z, .cb7, .tar, .cbt, and .epub.')
+                    sys.exit(1)
+            index = ConversionIndex(args.index_path) if args.index_path is not None else None
+            succeeded = manga2pdf_batch.run_batch(input_paths, lambda input_path: create_converter(args, input_path, None),
+                                                  args.executor, args.max_workers, args.jobs, cpu_heavy, index)
+            sys.exit(0 if succeeded else 1)
+
+        input_path = args.input_paths[0]
+        if not is_supported_input(input_path):
+            print('Error: The input file format is not supported. The currently supported formats are: .zip, .cbz, .rar, .cbr, .7z, .cb7, .tar, .cbt, and .epub.')
+            sys.exit(1)
+        converter = create_converter(args, input_path, args.output_path)
+        if args.index_path is not None:
+            index = ConversionIndex(args.index_path)
+            if index.is_up_to_date(converter):
+                print(f'{converter.get_output_path()} is up to date.')
+                sys.exit(0)
+            converter.convert()
+            index.record(converter)
+            index.save()
+        else:
+            converter.convert()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
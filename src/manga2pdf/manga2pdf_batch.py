@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+import os
+import glob
+import time
+import concurrent.futures
+
+# Function to expand the input paths, glob patterns and the paths listed in a manifest file into a list of books
+# The glob matches that fail is_supported_input (e.g. the PDF files written next to the books, or an index file) are skipped,
+# while the paths given explicitly are kept so that the caller can report them
+def collect_inputs(input_paths, manifest_path=None, is_supported_input=None):
+    patterns = list(input_paths)
+    if manifest_path is not None:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                # Skip empty lines and comments
+                if line and not line.startswith('#'):
+                    patterns.append(line)
+    books = []
+    seen = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths = sorted(glob.glob(pattern, recursive=True))
+            if is_supported_input is not None:
+                paths = [path for path in paths if is_supported_input(path)]
+        else:
+            paths = [pattern]
+        for path in paths:
+            if path not in seen:
+                seen.add(path)
+                books.append(path)
+    return books
+
+# Function to create the pool of page workers shared by all books
+def create_shared_executor(executor_type, max_workers, cpu_heavy):
+    if executor_type == 'auto':
+        executor_type = 'process' if cpu_heavy and (os.cpu_count() or 1) > 1 else 'thread'
+    if executor_type == 'process':
+        max_workers = max_workers or os.cpu_count() or 1
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers), max_workers
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers), max_workers
+
+# Function to convert one book with the shared pool and return its summary
+def convert_book(converter, executor, max_workers):
+    converter.set_executor(executor)
+    converter.set_max_workers(max_workers)
+    start = time.perf_counter()
+    converter.convert()
+    return converter.get_output_path(), converter.num_pages, time.perf_counter() - start
+
+# Function to convert many books concurrently with one shared pool of page workers
+# create_converter is called with each input path and returns a configured MangaPdfConverter
+# At most `jobs` books are in flight, so the save phase of one book overlaps with the page conversion of the others
+# If a ConversionIndex is given, books whose PDF is up to date are skipped and converted books are recorded in it
+# Returns True if all books were converted
+def run_batch(input_paths, create_converter, executor_type='thread', max_workers=None, jobs=2, cpu_heavy=False, index=None):
+    converters = [create_converter(input_path) for input_path in input_paths]
+    # Books converted at the same time must not write to the same PDF file
+    output_paths = {}
+    for input_path, converter in zip(input_paths, converters):
+        output_path = os.path.abspath(converter.get_output_path())
+        if output_path in output_paths:
+            print(f'Error: {output_paths[output_path]} and {input_path} would both be converted to {output_path}.')
+            return False
+        output_paths[output_path] = input_path
+    start = time.perf_counter()
+    num_pages = 0
+    failed = []
+    skipped = []
+    executor, max_workers = create_shared_executor(executor_type, max_workers, cpu_heavy)
+    try:
+        with executor, concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as book_executor:
+            futures = {}
+            for input_path, converter in zip(input_paths, converters):
+                if index is not None and index.is_up_to_date(converter):
+                    skipped.append(input_path)
+                    continue
+                future = book_executor.submit(convert_book, converter, executor, max_workers)
+                futures[future] = (input_path, converter)
+            for future in concurrent.futures.as_completed(futures):
+                input_path, converter = futures[future]
+                try:
+                    output_path, book_pages, elapsed = future.result()
+                except Exception as e:
+                    failed.append(input_path)
+                    print(f'[FAILED] {input_path}: {e}')
+                    continue
+                if index is not None:
+                    index.record(converter)
+                num_pages += book_pages
+                print(f'[OK] {input_path} -> {output_path} ({book_pages} pages, {elapsed:.1f}s, {book_pages / max(elapsed, 1e-9):.1f} pages/s)')
+    finally:
+        # Record the finished books even if the batch is interrupted
+        if index is not None:
+            index.save()
+    elapsed = time.perf_counter() - start
+    print(f'Converted {len(input_paths) - len(failed) - len(skipped)} of {len(input_paths)} books, '
+          f'{num_pages} pages in {elapsed:.1f}s ({num_pages / max(elapsed, 1e-9):.1f} pages/s)')
+    if skipped:
+        print(f'Skipped: {len(skipped)} books are up to date')
+    if failed:
+        print(f'Failed: {len(failed)} books')
+        for input_path in failed:
+            print(f'  {input_path}')
+    return not failed
@@ -6,16 +6,17 @@ import os
 import sys
 import i18n
 import json
+import time
+import queue
 import tkface
-import pikepdf
-import zipfile
 import datetime
 import platform
+import threading
 import subprocess
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
-from .manga2pdf import MangaPdfConverter, __version__
+from .manga2pdf import MangaPdfConverter, EpubPackage, ConversionCanceled, __version__
 
 
 class MangaPdfConverterGUI:
@@ -95,8 +96,8 @@ class MangaPdfConverterGUI:
         self.conversion_labelframe.grid(row=0, column=0, rowspan=5, sticky="nsew", padx=2, pady=1)
 
         self.conversion_var = tk.StringVar(value="none")
-        self.conversion_text_keys = ["no_compression", "convert_to_jpeg", "convert_to_grayscale"]
-        self.conversion_value = ["none", "jpeg", "grayscale"]
+        self.conversion_text_keys = ["no_compression", "convert_to_jpeg", "convert_to_grayscale", "convert_to_bitonal"]
+        self.conversion_value = ["none", "jpeg", "grayscale", "bitonal"]
         self.conversion_radio = []
         for i, key in enumerate(self.conversion_text_keys):
             conversion_radio = ttk.Radiobutton(
@@ -383,9 +384,8 @@ class MangaPdfConverterGUI:
 
             converter = MangaPdfConverter(input_path=self.input_path, output_path=self.output_path, pagelayout=self.pagelayout_var.get(), pagemode=self.pagemode_var.get(), direction=self.direction_var.get())
             if converter.is_epub_file(self.input_path):
-                with zipfile.ZipFile(self.input_path) as epub:
-                    opf_name = converter.extract_epub_contents(epub)[3]
-                    epub_metadata = converter.extract_epub_metadata(epub, opf_name)
+                with EpubPackage(self.input_path) as epub:
+                    epub_metadata = epub.metadata
                     self.title_entry.delete(0, tk.END)
                     self.title_entry.insert(0, epub_metadata['title'])
                     self.author_entry.delete(0, tk.END)
@@ -448,24 +448,23 @@ class MangaPdfConverterGUI:
         # Set the output path and filename
         self.output_path = output_path
 
-    def set_metadata(self, output_path):
-        with pikepdf.Pdf.open(output_path, allow_overwriting_input=True) as pdf:
-            with pdf.open_metadata(set_pikepdf_as_editor=False) as pdf_metadata:
-                pdf_metadata['dc:title'] = self.title_entry.get() if self.title_entry.get() else ''
-                pdf_metadata['dc:creator'] = [self.author_entry.get() if self.author_entry.get() else '']
-                pdf_metadata['dc:publisher'] = self.publisher_entry.get() if self.publisher_entry.get() else ''
-                creation_date_obj = self.creation_date_entry.get_date()
-                if creation_date_obj is None:
-                    creation_date_obj = datetime.datetime.now().date()
-                creation_date = creation_date_obj.strftime("%Y-%m-%d")
-                modify_date_obj = self.modify_date_entry.get_date()
-                if modify_date_obj is None:
-                    modify_date_obj = datetime.datetime.now().date()
-                modify_date = modify_date_obj.strftime("%Y-%m-%d")
-                pdf_metadata['xmp:CreateDate'] = f"{creation_date} {self.creation_time_combobox.get()}"
-                pdf_metadata['xmp:ModifyDate'] = f"{modify_date} {self.modify_time_combobox.get()}"
-                pdf_metadata['pdf:Producer'] = ''
-            pdf.save(output_path, linearize=True)
+    # Function to read the metadata entered in the window; it must be called from the Tk thread
+    def get_metadata(self):
+        creation_date_obj = self.creation_date_entry.get_date()
+        if creation_date_obj is None:
+            creation_date_obj = datetime.datetime.now().date()
+        creation_date = creation_date_obj.strftime("%Y-%m-%d")
+        modify_date_obj = self.modify_date_entry.get_date()
+        if modify_date_obj is None:
+            modify_date_obj = datetime.datetime.now().date()
+        modify_date = modify_date_obj.strftime("%Y-%m-%d")
+        return {
+            'title': self.title_entry.get() if self.title_entry.get() else '',
+            'creators': [self.author_entry.get() if self.author_entry.get() else ''],
+            'publisher': self.publisher_entry.get() if self.publisher_entry.get() else '',
+            'create_date': f"{creation_date} {self.creation_time_combobox.get()}",
+            'modify_date': f"{modify_date} {self.modify_time_combobox.get()}",
+        }
 
     def set_timestamp(self, output_path):
         if self.ctime_var.get():
@@ -528,81 +527,141 @@ class MangaPdfConverterGUI:
         # Determine the conversion options
         convert_to_jpeg = self.conversion_var.get() == "jpeg"
         convert_to_grayscale = self.conversion_var.get() == "grayscale"
+        convert_to_bitonal = self.conversion_var.get() == "bitonal"
 
         # Call MangaPdfConverter with the appropriate arguments
         try:
             converter = MangaPdfConverter(input_path=input_path, output_path=output_path, pagelayout=self.pagelayout_var.get(), pagemode=self.pagemode_var.get(), direction=self.direction_var.get())
+            converter.set_convert_to_jpeg(convert_to_jpeg)
+            converter.set_convert_to_grayscale(convert_to_grayscale)
+            converter.set_convert_to_bitonal(convert_to_bitonal)
+        except Exception as e:
+            tkface.messagebox.showerror(title=i18n.t('gui.error'), message=f"{i18n.t('gui.conversion_failed_with_error')}\n{str(e)}", master=self.master)
+            return
 
-            # Ask user if they want to convert
-            answer = tkface.messagebox.askyesno(master=self.master, message=i18n.t('gui.are_you_sure'), title=i18n.t('gui.confirm_conversion'))
-
-            if not answer:
-                tkface.messagebox.showinfo(master=self.master, message=i18n.t('gui.conversion_canceled'), title=i18n.t('gui.conversion'))
-                return
-            
-            # Create "Processing..." window
-            processing_window = tk.Toplevel(self.master)
-            # Get the position and size of the parent window
-            main_x, main_y = self.master.winfo_x(), self.master.winfo_y()
-            main_width, main_height = self.master.winfo_width(), self.master.winfo_height()
-            # Calculate the position of the processing window
-            if self.system == "Windows":
-                sub_width, sub_height = 350, 80
-            else:
-                sub_width, sub_height = 250, 30
-            sub_x = main_x + (main_width - sub_width) // 2
-            sub_y = main_y + (main_height - sub_height) // 2
-            processing_window.geometry(f"{sub_width}x{sub_height}+{sub_x}+{sub_y}")
-            # Set the title of the window
-            processing_window.title(f"Manga PDF Converter v{__version__}")
-            # Set the parent of the processing window
-            processing_window.transient(self.master)
-            # Add widgets to the frame
-            processing_label = tk.Label(processing_window, text=i18n.t('gui.processing'), anchor='center')
-            processing_label.pack(expand=True, fill='both')
-
-            # Disable main window while process window is open
-            #self.master.withdraw()
-
-            # Make the processing window a modal dialog
-            processing_window.lift()
-            processing_window.focus_force()
-            processing_window.wait_visibility()
-            processing_window.grab_set()
-            processing_label.update()
-
-            if convert_to_jpeg:
-                converter.set_convert_to_jpeg(True)
-                converter.convert()
-            elif convert_to_grayscale:
-                converter.set_convert_to_grayscale(True)
-                converter.convert()
-            else:
-                converter.convert()
-            self.set_metadata(output_path)
-            self.set_timestamp(output_path)
+        # Ask user if they want to convert
+        answer = tkface.messagebox.askyesno(master=self.master, message=i18n.t('gui.are_you_sure'), title=i18n.t('gui.confirm_conversion'))
 
-            # Close process window when done
-            if "processing_window" in locals(): processing_window.grab_release()
-            if "processing_window" in locals(): processing_window.destroy()
+        if not answer:
+            tkface.messagebox.showinfo(master=self.master, message=i18n.t('gui.conversion_canceled'), title=i18n.t('gui.conversion'))
+            return
 
-            # Re-enable main window
-            #self.master.deiconify()
+        # The metadata is written by the converter before its single save of the PDF
+        # The widgets are read here because Tk must only be used from this thread
+        converter.set_metadata(**self.get_metadata())
+        self.show_processing_window(converter)
+
+        # Convert in a background thread, which reports its progress through the queue polled by poll_progress
+        self.progress_queue = queue.Queue()
+        self.progress_start = time.perf_counter()
+        converter.set_progress_callback(lambda num_done, num_pages: self.progress_queue.put(('progress', num_done, num_pages)))
+        worker = threading.Thread(target=self.convert_worker, args=(converter,), daemon=True)
+        worker.start()
+        self.master.after(100, self.poll_progress, output_path)
+
+    # Function to create the modal window showing the progress of the conversion, with a button to cancel it
+    def show_processing_window(self, converter):
+        processing_window = tk.Toplevel(self.master)
+        # Get the position and size of the parent window
+        main_x, main_y = self.master.winfo_x(), self.master.winfo_y()
+        main_width, main_height = self.master.winfo_width(), self.master.winfo_height()
+        # Calculate the position of the processing window
+        if self.system == "Windows":
+            sub_width, sub_height = 420, 130
+        else:
+            sub_width, sub_height = 360, 110
+        sub_x = main_x + (main_width - sub_width) // 2
+        sub_y = main_y + (main_height - sub_height) // 2
+        processing_window.geometry(f"{sub_width}x{sub_height}+{sub_x}+{sub_y}")
+        # Set the title of the window
+        processing_window.title(f"Manga PDF Converter v{__version__}")
+        # Set the parent of the processing window
+        processing_window.transient(self.master)
+        # Add widgets to the frame
+        self.processing_label = ttk.Label(processing_window, text=i18n.t('gui.processing'), anchor='center')
+        self.processing_label.pack(expand=True, fill='both', padx=10, pady=(10, 0))
+        self.progress_bar = ttk.Progressbar(processing_window, mode='determinate', maximum=1)
+        self.progress_bar.pack(fill='x', padx=10, pady=5)
+        self.cancel_button = ttk.Button(processing_window, text=i18n.t('gui.cancel'), command=lambda: self.cancel_convert(converter))
+        self.cancel_button.pack(pady=(0, 10))
+        # Closing the window cancels the conversion
+        processing_window.protocol("WM_DELETE_WINDOW", lambda: self.cancel_convert(converter))
+
+        # Make the processing window a modal dialog
+        processing_window.lift()
+        processing_window.focus_force()
+        processing_window.wait_visibility()
+        processing_window.grab_set()
+        self.processing_window = processing_window
+
+    def close_processing_window(self):
+        if self.processing_window is not None:
+            self.processing_window.grab_release()
+            self.processing_window.destroy()
+            self.processing_window = None
+
+    def cancel_convert(self, converter):
+        converter.cancel()
+        self.processing_label.configure(text=i18n.t('gui.canceling'))
+        self.cancel_button.configure(state='disabled')
+
+    # Function run in the background thread; the result is sent to the Tk thread through the queue
+    def convert_worker(self, converter):
+        try:
+            converter.convert()
+            self.progress_queue.put(('done',))
+        except ConversionCanceled:
+            self.progress_queue.put(('canceled',))
+        except Exception as e:
+            self.progress_queue.put(('error', e))
 
-            # Check if output file was created
-            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                tkface.messagebox.showinfo(master=self.master, message=i18n.t('gui.conversion_complete'), title=i18n.t('gui.success'))
+    # Function to update the progress bar with the messages of the background thread, until the conversion ends
+    def poll_progress(self, output_path):
+        while True:
+            try:
+                message = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'progress':
+                self.update_progress(message[1], message[2])
             else:
-                tkface.messagebox.showerror(master=self.master, message=i18n.t('gui.conversion_failed'), title=i18n.t('gui.error'))
+                self.finish_convert(message, output_path)
+                return
+        self.master.after(100, self.poll_progress, output_path)
 
+    # Function to show the number of pages done, the pages per second and the estimated time remaining
+    def update_progress(self, num_done, num_pages):
+        if str(self.cancel_button['state']) == 'disabled':
+            return
+        self.progress_bar.configure(maximum=max(num_pages, 1), value=num_done)
+        if num_done >= num_pages:
+            self.processing_label.configure(text=i18n.t('gui.writing_pdf'))
+            return
+        elapsed = time.perf_counter() - self.progress_start
+        rate = num_done / elapsed if elapsed > 0 else 0.0
+        eta = int((num_pages - num_done) / rate) if rate > 0 else 0
+        self.processing_label.configure(text=i18n.t('gui.progress', done=num_done, total=num_pages, rate=f"{rate:.1f}", eta=f"{eta // 60}:{eta % 60:02d}"))
+
+    def finish_convert(self, message, output_path):
+        # Close process window when done
+        self.close_processing_window()
+        if message[0] == 'canceled':
+            tkface.messagebox.showinfo(master=self.master, message=i18n.t('gui.conversion_canceled'), title=i18n.t('gui.conversion'))
+            return
+        if message[0] == 'error':
+            tkface.messagebox.showerror(title=i18n.t('gui.error'), message=f"{i18n.t('gui.conversion_failed_with_error')}\n{str(message[1])}", master=self.master)
+            return
+        try:
+            self.set_timestamp(output_path)
         except Exception as e:
-            # Close process window when done
-            if "processing_window" in locals(): processing_window.grab_release()
-            if "processing_window" in locals(): processing_window.destroy()
             tkface.messagebox.showerror(title=i18n.t('gui.error'), message=f"{i18n.t('gui.conversion_failed_with_error')}\n{str(e)}", master=self.master)
+            return
 
-            # Re-enable main window
-            self.master.deiconify()
+        # Check if output file was created
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            tkface.messagebox.showinfo(master=self.master, message=i18n.t('gui.conversion_complete'), title=i18n.t('gui.success'))
+        else:
+            tkface.messagebox.showerror(master=self.master, message=i18n.t('gui.conversion_failed'), title=i18n.t('gui.error'))
 
 def launch_gui():
     root = tk.Tk()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 mashu3
+# This software is released under the MIT License, see LICENSE.
+
+import os
+import time
+import signal
+import threading
+import concurrent.futures
+from . import manga2pdf_batch
+
+# Function to list the books dropped in the watched directory
+# Hidden entries are skipped, so partial copies and temporary files named like ".book.cbz" are not picked up
+def scan_inbox(watch_dir, is_supported_input):
+    paths = []
+    for name in sorted(os.listdir(watch_dir)):
+        path = os.path.join(watch_dir, name)
+        if not name.startswith('.') and is_supported_input(path):
+            paths.append(path)
+    return paths
+
+def stop_watching(signum, frame):
+    raise KeyboardInterrupt
+
+# Function to watch a directory and convert the books dropped in it until interrupted
+# create_converter is called with each input path and returns a configured MangaPdfConverter
+# The directory is polled every `interval` seconds. A book is converted once its fingerprint (the size and modification time
+# of the file, or of each image of a directory) has not changed for `stable_time` seconds, so books still being copied are not read.
+# The page workers and at most `jobs` book workers stay alive between books, so new books start without importing or forking again.
+# Converted books are recorded in the ConversionIndex `index`, so books converted before a restart are not converted again.
+def watch(watch_dir, create_converter, is_supported_input, index, executor_type='thread', max_workers=None, jobs=2,
+          cpu_heavy=False, interval=2.0, stable_time=5.0):
+    # Books seen in the directory: input path -> [converter, fingerprint, time the fingerprint was first seen]
+    books = {}
+    # Books that would overwrite the PDF of another book (e.g. book.cbz and book.epub), skipped until the other book is removed
+    clashes = set()
+    # Books being converted: future -> input path
+    futures = {}
+    # Fingerprints of the books that failed, retried only once they change
+    failed = {}
+    # Stop on SIGTERM (e.g. from a service manager) as on Ctrl+C
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop_watching)
+    executor, max_workers = manga2pdf_batch.create_shared_executor(executor_type, max_workers, cpu_heavy)
+    print(f'Watching {watch_dir} (press Ctrl+C to stop)', flush=True)
+    with executor, concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as book_executor:
+        try:
+            while True:
+                now = time.monotonic()
+                in_flight = set(futures.values())
+                paths = scan_inbox(watch_dir, is_supported_input)
+                for input_path in list(books):
+                    if input_path not in paths and input_path not in in_flight:
+                        del books[input_path]
+                output_paths = {}
+                for input_path in paths:
+                    if input_path not in books:
+                        books[input_path] = [create_converter(input_path), None, now]
+                    book = books[input_path]
+                    output_path = os.path.abspath(book[0].get_output_path())
+                    if output_path in output_paths:
+                        if input_path not in clashes:
+                            clashes.add(input_path)
+                            print(f'[SKIPPED] {input_path}: {output_paths[output_path]} is also converted to {output_path}', flush=True)
+                        continue
+                    output_paths[output_path] = input_path
+                    clashes.discard(input_path)
+                    if input_path in in_flight:
+                        continue
+                    try:
+                        fingerprint = book[0].get_fingerprint()
+                    except OSError:
+                        # The book was moved or removed while it was scanned
+                        continue
+                    if fingerprint != book[1]:
+                        book[1], book[2] = fingerprint, now
+                        continue
+                    if now - book[2] < stable_time or failed.get(input_path) == fingerprint:
+                        continue
+                    if index.is_up_to_date(book[0]):
+                        continue
+                    future = book_executor.submit(manga2pdf_batch.convert_book, book[0], executor, max_workers)
+                    futures[future] = input_path
+                done, _ = concurrent.futures.wait(futures, timeout=interval)
+                for future in done:
+                    input_path = futures.pop(future)
+                    converter = books[input_path][0]
+                    try:
+                        output_path, book_pages, elapsed = future.result()
+                    except Exception as e:
+                        failed[input_path] = books[input_path][1]
+                        print(f'[FAILED] {input_path}: {e}', flush=True)
+                        continue
+                    failed.pop(input_path, None)
+                    index.record(converter)
+                    index.save()
+                    print(f'[OK] {input_path} -> {output_path} ({book_pages} pages, {elapsed:.1f}s, {book_pages / max(elapsed, 1e-9):.1f} pages/s)',
+                          flush=True)
+                if not done and not futures:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            # Stop the books in flight; the previous PDF files are kept
+            for input_path in futures.values():
+                books[input_path][0].cancel()
+    print('Stopped watching.')